@@ -0,0 +1,34 @@
+"""Add version columns
+
+Revision ID: 7c1f4b9e2a31
+Revises: 05e885e53847
+Create Date: 2026-10-17 10:12:41.532904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1f4b9e2a31'
+down_revision = '05e885e53847'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'charityproject',
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1')
+    )
+    op.add_column(
+        'donation',
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1')
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('donation') as batch_op:
+        batch_op.drop_column('version')
+    with op.batch_alter_table('charityproject') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,49 @@
+"""Add open rows indexes
+
+Revision ID: b52e8d0c4f17
+Revises: 7c1f4b9e2a31
+Create Date: 2026-10-17 14:05:12.918734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52e8d0c4f17'
+down_revision = '7c1f4b9e2a31'
+branch_labels = None
+depends_on = None
+
+
+def fully_invested_is(value):
+    condition = sa.column('fully_invested') == (
+        sa.true() if value else sa.false()
+    )
+    return {'sqlite_where': condition, 'postgresql_where': condition}
+
+
+def upgrade():
+    for table_name in ('charityproject', 'donation'):
+        op.create_index(
+            f'ix_{table_name}_open',
+            table_name,
+            ['id', 'full_amount', 'invested_amount', 'version'],
+            **fully_invested_is(False)
+        )
+    op.create_index(
+        'ix_charityproject_closed',
+        'charityproject',
+        ['close_date', 'create_date'],
+        **fully_invested_is(True)
+    )
+    op.create_index(
+        op.f('ix_donation_user_id'), 'donation', ['user_id']
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_donation_user_id'), table_name='donation')
+    op.drop_index('ix_charityproject_closed', table_name='charityproject')
+    for table_name in ('donation', 'charityproject'):
+        op.drop_index(f'ix_{table_name}_open', table_name=table_name)
@@ -0,0 +1,31 @@
+"""Add report spreadsheet
+
+Revision ID: d81f3a6c9e52
+Revises: b52e8d0c4f17
+Create Date: 2026-10-17 15:21:47.305119
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f3a6c9e52'
+down_revision = 'b52e8d0c4f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reportspreadsheet',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_email', sa.String(length=320), nullable=False),
+    sa.Column('spreadsheet_id', sa.String(length=100), nullable=False),
+    sa.Column('values', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('owner_email')
+    )
+
+
+def downgrade():
+    op.drop_table('reportspreadsheet')
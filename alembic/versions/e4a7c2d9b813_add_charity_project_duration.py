@@ -0,0 +1,52 @@
+"""Add charity project duration
+
+Revision ID: e4a7c2d9b813
+Revises: d81f3a6c9e52
+Create Date: 2026-10-17 17:02:36.618420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c2d9b813'
+down_revision = 'd81f3a6c9e52'
+branch_labels = None
+depends_on = None
+
+DURATION_SQL = {
+    'sqlite': (
+        "CAST(strftime('%s', close_date) AS INTEGER) - "
+        "CAST(strftime('%s', create_date) AS INTEGER)"
+    ),
+    'postgresql': (
+        "CAST(EXTRACT(EPOCH FROM date_trunc('second', close_date)) - "
+        "EXTRACT(EPOCH FROM date_trunc('second', create_date)) AS INTEGER)"
+    ),
+}
+
+
+def upgrade():
+    op.add_column(
+        'charityproject', sa.Column('duration', sa.Integer(), nullable=True)
+    )
+    dialect = op.get_bind().dialect.name
+    op.execute(
+        f'UPDATE charityproject SET duration = {DURATION_SQL[dialect]} '
+        'WHERE fully_invested AND close_date IS NOT NULL'
+    )
+    condition = sa.column('fully_invested') == sa.true()
+    op.create_index(
+        'ix_charityproject_duration',
+        'charityproject',
+        ['duration'],
+        sqlite_where=condition,
+        postgresql_where=condition
+    )
+
+
+def downgrade():
+    op.drop_index('ix_charityproject_duration', table_name='charityproject')
+    with op.batch_alter_table('charityproject') as batch_op:
+        batch_op.drop_column('duration')
@@ -0,0 +1,38 @@
+"""Add fund stats
+
+Revision ID: f3b9d1e7a245
+Revises: e4a7c2d9b813
+Create Date: 2026-10-17 18:12:04.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d1e7a245'
+down_revision = 'e4a7c2d9b813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('fundstats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total_raised', sa.Integer(), nullable=False),
+    sa.Column('total_invested', sa.Integer(), nullable=False),
+    sa.Column('open_projects', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        'INSERT INTO fundstats '
+        '(id, total_raised, total_invested, open_projects) '
+        'SELECT 1, '
+        '(SELECT COALESCE(SUM(full_amount), 0) FROM donation), '
+        '(SELECT COALESCE(SUM(invested_amount), 0) FROM donation), '
+        '(SELECT COUNT(*) FROM charityproject WHERE NOT fully_invested)'
+    )
+
+
+def downgrade():
+    op.drop_table('fundstats')
@@ -1,21 +1,33 @@
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, Depends, Body, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.export import ExportParams, export_response
+from app.api.pagination import NEXT_CURSOR_HEADER, Page
+from app.api.serialization import encode_rows, schema_columns
 from app.api.validators import (
     ensure_project_can_be_updated,
     ensure_project_exists,
     ensure_project_is_not_funded,
     ensure_project_name_is_unique
 )
+from app.core.config import settings
 from app.core.db import get_async_session
+from app.core.response_cache import project_list_cache
 from app.core.user import current_superuser
-from app.crud import charity_project_crud, donation_crud
+from app.crud import charity_project_crud
+from app.models import CharityProject
 from app.schemas import (
     CharityProjectCreate,
     CharityProjectDB,
     CharityProjectUpdate
 )
-from app.services.investment import invest
+from app.services.allocation_queue import (
+    create_and_schedule,
+    schedule_allocation
+)
 
 router = APIRouter()
 
@@ -26,10 +38,56 @@ router = APIRouter()
             summary="Retrieve a list of charity projects"
             )
 async def retrieve_all_charity_projects(
+        page: Page = Depends(),
+        session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Retrieve a page of charity projects.
+    The next page is requested with the X-Next-Cursor response header.
+
+    Pages are cached already serialised until a project changes,
+    so a cache hit neither queries the database nor validates models.
+    With FAST_SERIALIZATION a missed page is encoded straight from
+    the selected columns.
+    """
+    variant = f"{page.after_id}.{page.limit}"
+    version = await project_list_cache.version()
+    cached = await project_list_cache.get(version, variant)
+    if cached is None:
+        if settings.fast_serialization:
+            projects = await charity_project_crud.get_multi_rows(
+                session=session,
+                columns=schema_columns(CharityProject, CharityProjectDB),
+                after_id=page.after_id, limit=page.limit)
+            body = encode_rows(projects, CharityProjectDB)
+        else:
+            projects = await charity_project_crud.get_multi(
+                session=session, after_id=page.after_id, limit=page.limit)
+            body = JSONResponse(jsonable_encoder(
+                parse_obj_as(list[CharityProjectDB], projects),
+                exclude_none=True
+            )).body
+        cached = (page.next_cursor(projects) or "").encode() + b"\n" + body
+        await project_list_cache.set(version, variant, cached)
+    next_cursor, body = cached.split(b"\n", 1)
+    headers = {NEXT_CURSOR_HEADER: next_cursor.decode()} if next_cursor else {}
+    return Response(body, media_type=JSONResponse.media_type, headers=headers)
+
+
+@router.get('/export',
+            dependencies=[Depends(current_superuser)],
+            summary="Export charity projects as NDJSON or CSV"
+            )
+async def export_charity_projects(
+        params: ExportParams = Depends(),
         session: AsyncSession = Depends(get_async_session)
 ):
-    """Retrieve a list of charity projects."""
-    return await charity_project_crud.get_multi(session=session)
+    """
+    Stream all charity projects matching the filters.
+    Available to superusers only.
+    """
+    return export_response(
+        charity_project_crud, CharityProjectDB, params, session)
 
 
 @router.post('/',
@@ -46,12 +104,7 @@ async def create_charity_project(
 ):
     """Create a charity project. Available to superusers only."""
     await ensure_project_name_is_unique(project.name, session)
-    new_project = await charity_project_crud.create(
-        data=project, session=session)
-    active_donations = await donation_crud.get_active_objs(session)
-    if active_donations:
-        await invest(new_project, active_donations, session)
-    return new_project
+    return await create_and_schedule(charity_project_crud, project, session)
 
 
 @router.patch('/{project_id}',
@@ -73,10 +126,7 @@ async def modify_charity_project(
         await ensure_project_name_is_unique(update_data.name, session)
     updated_project = await charity_project_crud.update(
         db_obj=charity_project, data=update_data, session=session)
-    active_donations = await donation_crud.get_active_objs(session)
-    if active_donations:
-        await invest(updated_project, active_donations, session)
-
+    await schedule_allocation(updated_project, session)
     return updated_project
 
 
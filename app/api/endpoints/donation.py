@@ -1,12 +1,33 @@
-from fastapi import APIRouter, Depends
+from functools import partial
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.etag import is_not_modified, not_modified, set_etag
+from app.api.export import ExportParams, export_response
+from app.api.pagination import Page
+from app.api.serialization import rows_response, schema_columns
+from app.core.config import settings
 from app.core.db import get_async_session
+from app.core.donation_cache import donation_cache
 from app.core.user import current_superuser, current_user
-from app.crud import charity_project_crud, donation_crud
-from app.schemas import DonationCreate, DonationFullDB, DonationShortDB
-from app.services.investment import invest
-from app.models import User
+from app.crud import donation_crud
+from app.schemas import (
+    AllocationStatus,
+    DonationCreate,
+    DonationFullDB,
+    DonationImportResult,
+    DonationShortDB,
+    DonationSummary
+)
+from app.services.allocation_queue import (
+    allocation_worker,
+    create_and_schedule,
+    donation_batcher
+)
+from app.services.donation_import import import_donations, parse_records
+from app.models import Donation, User
 
 
 router = APIRouter()
@@ -19,13 +40,38 @@ router = APIRouter()
             summary="Retrieve a list of all donations"
             )
 async def get_all_donations(
+        response: Response,
+        page: Page = Depends(),
+        session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Returns a page of all donations.
+    Available to superusers only.
+    """
+    if settings.fast_serialization:
+        return rows_response(await donation_crud.get_multi_rows(
+            session=session,
+            columns=schema_columns(Donation, DonationFullDB),
+            after_id=page.after_id, limit=page.limit
+        ), DonationFullDB, page)
+    donations = await donation_crud.get_multi(
+        session=session, after_id=page.after_id, limit=page.limit)
+    return page.set_next_cursor(response, donations)
+
+
+@router.get('/export',
+            dependencies=[Depends(current_superuser)],
+            summary="Export donations as NDJSON or CSV"
+            )
+async def export_donations(
+        params: ExportParams = Depends(),
         session: AsyncSession = Depends(get_async_session)
 ):
     """
-    Returns a list of all donations.
+    Stream all donations matching the filters.
     Available to superusers only.
     """
-    return await donation_crud.get_multi(session=session)
+    return export_response(donation_crud, DonationFullDB, params, session)
 
 
 @router.post('/',
@@ -41,13 +87,41 @@ async def create_new_donation(
     """
     Creates a new donation and links it to the current user.
     Available to authenticated users only.
+
+    When ALLOCATION_BATCH_WINDOW is set, the donation is persisted and
+    allocated by the batcher in its own transaction, always through the
+    FIFO ledger, and the request session is left unused.
+    """
+    if settings.allocation_batch_window:
+        return await donation_batcher.submit(donation, user)
+    return await create_and_schedule(donation_crud, donation, session, user)
+
+
+@router.post('/import',
+             response_model=DonationImportResult,
+             dependencies=[Depends(current_superuser)],
+             summary="Import a batch of donations"
+             )
+async def import_donation_batch(
+        request: Request,
+        session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Imports a JSON array of donations with a user_id each, or a CSV file
+    with a header row sent as text/csv, and allocates them in one pass.
+    Rows that fail validation are reported and skipped.
+    Available to superusers only.
     """
-    new_donation = await donation_crud.create(
-        data=donation, session=session, user=user)
-    active_projects = await charity_project_crud.get_active_objs(session)
-    if active_projects:
-        await invest(new_donation, active_projects, session)
-    return new_donation
+    try:
+        records = parse_records(
+            await request.body(), request.headers.get("content-type", "")
+        )
+    except ValueError as error:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=str(error)
+        )
+    return await import_donations(records, session)
 
 
 @router.get('/my',
@@ -56,12 +130,72 @@ async def create_new_donation(
             summary="Retrieve the list of user's donations"
             )
 async def get_user_donations(
+        request: Request,
+        response: Response,
+        page: Page = Depends(),
+        session: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_user)
+):
+    """
+    Returns a page of donations made by the current user.
+    A request with the ETag of an unchanged page in If-None-Match
+    gets 304 without querying the database.
+    Available to authenticated users only.
+    """
+    etag = donation_cache.etag(user.id, f"page.{page.after_id}.{page.limit}")
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    if settings.fast_serialization:
+        response = rows_response(await donation_crud.get_user_donation_rows(
+            user_id=user.id, session=session,
+            columns=schema_columns(Donation, DonationShortDB),
+            after_id=page.after_id, limit=page.limit
+        ), DonationShortDB, page)
+        set_etag(response, etag)
+        return response
+    set_etag(response, etag)
+    donations = await donation_crud.get_user_donations(
+        session=session, user_id=user.id,
+        after_id=page.after_id, limit=page.limit)
+    return page.set_next_cursor(response, donations)
+
+
+@router.get('/my/summary',
+            response_model=DonationSummary,
+            response_model_exclude_none=True,
+            summary="Retrieve the totals and latest donations of the user"
+            )
+async def get_user_donation_summary(
+        request: Request,
+        response: Response,
         session: AsyncSession = Depends(get_async_session),
         user: User = Depends(current_user)
 ):
     """
-    Returns a list of donations made by the current user.
+    Returns the number and the total of the current user's donations
+    with the latest of them, cached until they change.
+    A request with the current ETag in If-None-Match gets 304.
     Available to authenticated users only.
     """
-    return await donation_crud.get_user_donations(
-        session=session, user_id=user.id)
+    etag = donation_cache.etag(user.id)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    etag, summary = await donation_cache.get_summary(
+        user.id,
+        partial(donation_crud.get_user_summary, user.id, session)
+    )
+    set_etag(response, etag)
+    return summary
+
+
+@router.get('/allocation',
+            response_model=AllocationStatus,
+            dependencies=[Depends(current_superuser)],
+            summary="Retrieve the progress of deferred allocation"
+            )
+async def get_allocation_status():
+    """
+    Returns the state of the background allocation worker.
+    Available to superusers only.
+    """
+    return allocation_worker.status()
@@ -5,16 +5,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from aiogoogle import Aiogoogle
 
+from app.api.report import ReportParams
 from app.core.db import get_async_session
 from app.core.google_client import get_service
 from app.core.user import current_superuser
 from app.crud.charity_project import charity_project_crud
+from app.schemas import CharityProjectReport, ReportJob
 from app.schemas.charity_project import CharityProjectDB
-from app.services.google_api import (
-    spreadsheets_create,
-    set_user_permissions,
-    spreadsheets_update_value
-)
+from app.services.google_api import generate_report
+from app.services.report_jobs import report_jobs
 
 router = APIRouter()
 
@@ -26,24 +25,82 @@ router = APIRouter()
     response_model_exclude_none=True
 )
 async def get_report(
+        params: ReportParams = Depends(),
         session: AsyncSession = Depends(get_async_session),
         wrapper_services: Aiogoogle = Depends(get_service)
 ):
-    """Available to superusers only."""
+    """
+    Available to superusers only.
+
+    With PERSISTENT_REPORT set, one spreadsheet is kept per owner and
+    only the changed rows are written to it; otherwise a new spreadsheet
+    is created on every call.
+    """
     projects = await charity_project_crud.get_projects_by_completion_rate(
-        session
+        session, **params.filters
     )
-    spreadsheet_id = await spreadsheets_create(wrapper_services)
-    await set_user_permissions(spreadsheet_id, wrapper_services)
     try:
-        await spreadsheets_update_value(
-            spreadsheet_id,
-            projects,
-            wrapper_services
-        )
+        await generate_report(projects, session, wrapper_services)
     except ValueError as error:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail=str(error)
         )
     return projects
+
+
+@router.get(
+    '/json',
+    response_model=list[CharityProjectReport],
+    dependencies=[Depends(current_superuser)],
+)
+async def get_report_json(
+        params: ReportParams = Depends(),
+        session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Return the report rows without writing them to Google Sheets,
+    so it is cheap to poll.
+    Available to superusers only.
+    """
+    return await charity_project_crud.get_completion_rate_rows(
+        session, **params.filters
+    )
+
+
+@router.post(
+    '/jobs',
+    response_model=ReportJob,
+    status_code=HTTPStatus.ACCEPTED,
+    dependencies=[Depends(current_superuser)],
+    response_model_exclude_none=True
+)
+async def create_report_job(params: ReportParams = Depends()):
+    """
+    Start generating the report in the background and return the job.
+    A request made while the same report is being generated returns
+    the running job.
+    Available to superusers only.
+    """
+    return report_jobs.submit(**params.filters)
+
+
+@router.get(
+    '/jobs/{job_id}',
+    response_model=ReportJob,
+    dependencies=[Depends(current_superuser)],
+    response_model_exclude_none=True
+)
+async def get_report_job(job_id: str):
+    """
+    Return the progress of a report job and, once it is done,
+    the spreadsheet URL.
+    Available to superusers only.
+    """
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail="Report job with the specified ID not found!"
+        )
+    return job
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_async_session
+from app.crud.fund_stats import fund_stats_crud
+from app.schemas import FundStatsDB
+
+router = APIRouter()
+
+
+@router.get('/',
+            response_model=FundStatsDB,
+            summary="Retrieve the fund-wide totals"
+            )
+async def get_fund_stats(
+        session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Return the total raised and invested amounts, the number of open
+    projects and the donated amount not allocated yet.
+    The totals are read from one row maintained on every write,
+    so the cost does not depend on the number of projects and donations.
+    """
+    totals = await fund_stats_crud.get(session)
+    if totals is None:
+        totals = await fund_stats_crud.compute(session)
+    return FundStatsDB(
+        **totals,
+        unallocated_amount=totals["total_raised"] - totals["total_invested"]
+    )
@@ -0,0 +1,33 @@
+from http import HTTPStatus
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def _opaque(tag: str) -> str:
+    """Drop the weak validator prefix, as If-None-Match compares weakly."""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check whether the client already holds the view tagged ``etag``."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = {_opaque(tag) for tag in header.split(",")}
+    return "*" in tags or _opaque(etag) in tags
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Tag a response and make clients revalidate it before reuse."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    """Return an empty 304 response for the view tagged ``etag``."""
+    response = Response(status_code=HTTPStatus.NOT_MODIFIED)
+    set_etag(response, etag)
+    return response
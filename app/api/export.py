@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Optional, Type
+
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+class ExportParams:
+    """Format and filters of an export request."""
+
+    def __init__(
+        self,
+        export_format: ExportFormat = Query(
+            ExportFormat.ndjson, alias="format"
+        ),
+        created_from: Optional[datetime] = Query(
+            None, description="Include objects created at or after"
+        ),
+        created_to: Optional[datetime] = Query(
+            None, description="Include objects created before"
+        ),
+        fully_invested: Optional[bool] = Query(
+            None, description="Export only closed or only open objects"
+        ),
+    ):
+        self.export_format = export_format
+        self.filters = {
+            "created_from": created_from,
+            "created_to": created_to,
+            "fully_invested": fully_invested,
+        }
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def _ndjson_lines(
+    rows: AsyncIterator, fields: list[str]
+) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(
+            {field: _encode_value(value) for field, value in zip(fields, row)}
+        ) + "\n"
+
+
+async def _csv_lines(
+    rows: AsyncIterator, fields: list[str]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for row in rows:
+        writer.writerow(_encode_value(value) for value in row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_response(
+    crud: CRUDBase,
+    schema: Type[BaseModel],
+    params: ExportParams,
+    session: AsyncSession,
+) -> StreamingResponse:
+    """
+    Stream every object matching ``params`` with the fields of ``schema``.
+
+    The rows are read through a server-side cursor and written as they
+    arrive, so memory use does not depend on the size of the table.
+    """
+    fields = list(schema.__fields__)
+    rows = crud.stream(
+        session,
+        [getattr(crud.model, field) for field in fields],
+        **params.filters
+    )
+    if params.export_format == ExportFormat.csv:
+        lines = _csv_lines(rows, fields)
+    else:
+        lines = _ndjson_lines(rows, fields)
+    return StreamingResponse(
+        lines,
+        media_type=MEDIA_TYPES[params.export_format],
+        headers={
+            "Content-Disposition": (
+                "attachment; "
+                f"filename={crud.model.__tablename__}."
+                f"{params.export_format.value}"
+            )
+        },
+    )
@@ -0,0 +1,64 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from http import HTTPStatus
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Query, Response
+
+from app.crud.base import LIMIT
+
+MAX_LIMIT = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    """Turn the id of the last object of a page into an opaque token."""
+    return urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Return the id a page token points after."""
+    try:
+        last_id = int(urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        last_id = -1
+    if last_id < 0:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail="Invalid page cursor!"
+        )
+    return last_id
+
+
+class Page:
+    """
+    Keyset pagination parameters of a list endpoint.
+
+    The token of the next page is returned in the ``X-Next-Cursor``
+    header, so the body stays a plain list of objects.
+    """
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(
+            None, description="Token from the X-Next-Cursor header"
+        ),
+        limit: int = Query(LIMIT, ge=1, le=MAX_LIMIT),
+    ):
+        self.after_id = decode_cursor(cursor) if cursor else 0
+        self.limit = limit
+
+    def next_cursor(self, objs: Sequence) -> Optional[str]:
+        """Return the token of the page following ``objs``, if any."""
+        if len(objs) == self.limit:
+            return encode_cursor(objs[-1].id)
+        return None
+
+    def set_next_cursor(
+        self, response: Response, objs: Sequence
+    ) -> Sequence:
+        """Point the response at the page following ``objs``."""
+        next_cursor = self.next_cursor(objs)
+        if next_cursor is not None:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return objs
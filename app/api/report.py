@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Query
+
+from app.api.pagination import MAX_LIMIT
+
+
+class ReportParams:
+    """Size and filters of a completion speed report request."""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(
+            None, ge=1, le=MAX_LIMIT,
+            description="Include only the N fastest closed projects"
+        ),
+        closed_from: Optional[datetime] = Query(
+            None, description="Include projects closed at or after"
+        ),
+        closed_to: Optional[datetime] = Query(
+            None, description="Include projects closed before"
+        ),
+        name_prefix: Optional[str] = Query(
+            None, min_length=1, max_length=100,
+            description="Include projects whose name starts with"
+        ),
+    ):
+        self.filters = {
+            "limit": limit,
+            "closed_from": closed_from,
+            "closed_to": closed_to,
+            "name_prefix": name_prefix,
+        }
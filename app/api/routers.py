@@ -4,7 +4,8 @@ from app.api.endpoints import (
     charity_project_router,
     donation_router,
     user_router,
-    google_api_router
+    google_api_router,
+    stats_router
 )
 
 
@@ -28,4 +29,10 @@ main_router.include_router(
     tags=["Google"]
 )
 
+main_router.include_router(
+    stats_router,
+    prefix="/stats",
+    tags=["Stats"]
+)
+
 main_router.include_router(user_router)
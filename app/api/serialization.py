@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+from typing import Sequence, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import Column
+
+from app.api.pagination import Page
+from app.core.db import Base
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def schema_columns(model: Type[Base], schema: Type[BaseModel]) -> list[Column]:
+    """Return the columns of ``model`` behind the fields of ``schema``."""
+    return [getattr(model, field) for field in schema.__fields__]
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_rows(rows: Sequence, schema: Type[BaseModel]) -> bytes:
+    """
+    Encode rows selected with ``schema_columns`` as the JSON list
+    a ``response_model_exclude_none`` route returns for ``schema``.
+
+    Uses orjson when it is installed and the standard library
+    encoder with the settings of ``JSONResponse`` otherwise.
+    """
+    fields = list(schema.__fields__)
+    objs = [
+        {
+            field: value
+            for field, value in zip(fields, row)
+            if value is not None
+        }
+        for row in rows
+    ]
+    if orjson is not None:
+        return orjson.dumps(objs)
+    return json.dumps(
+        objs,
+        default=_encode_value,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def rows_response(
+    rows: Sequence, schema: Type[BaseModel], page: Page
+) -> Response:
+    """Return a page of rows without validating them against ``schema``."""
+    response = Response(
+        encode_rows(rows, schema), media_type=JSONResponse.media_type
+    )
+    page.set_next_cursor(response, rows)
+    return response
@@ -1,10 +1,20 @@
 from typing import Optional
-from pydantic import BaseSettings, EmailStr
+from pydantic import BaseSettings, EmailStr, root_validator
 
 
 class Settings(BaseSettings):
     app_title: str = "QRKot - Charity Fund for Supporting Cats"
     database_url: str = "sqlite+aiosqlite:///./fastapi.db"
+    pool_size: int = 5
+    pool_max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+    sqlite_journal_mode: Optional[str] = "WAL"
+    sqlite_synchronous: Optional[str] = "NORMAL"
+    sqlite_busy_timeout: Optional[int] = 5000
+    sqlite_mmap_size: Optional[int] = 268435456
+    sqlite_cache_size: Optional[int] = -65536
     secret: str = "SECRET"
     first_superuser_email: Optional[EmailStr] = None
     first_superuser_password: Optional[str] = None
@@ -19,9 +29,41 @@ class Settings(BaseSettings):
     auth_provider_x509_cert_url: Optional[str] = None
     client_x509_cert_url: Optional[str] = None
     email: Optional[str] = None
+    allocation_mode: str = "ledger"
+    allocation_retries: int = 10
+    deferred_allocation: bool = False
+    allocation_queue_backend: str = "memory"
+    allocation_batch_window: float = 0
+    persistent_report: bool = False
+    google_discovery_ttl: int = 86400
+    google_discovery_cache_dir: Optional[str] = None
+    google_pool_size: int = 10
+    google_token_refresh_margin: int = 300
+    google_report_chunk_rows: int = 1000
+    donation_summary_cache_size: int = 10000
+    response_cache_backend: str = "memory"
+    response_cache_size: int = 1024
+    user_cache_ttl: float = 60
+    user_cache_size: int = 10000
+    password_hash_rounds: int = 12
+    password_hash_workers: int = 2
+    fast_serialization: bool = False
 
     class Config:
         env_file = ".env"
 
+    @root_validator(skip_on_failure=True)
+    def allocation_modes_are_compatible(cls, values):
+        """
+        Batched donations are allocated before their request returns,
+        so batching cannot be combined with deferred allocation.
+        """
+        if values["allocation_batch_window"] and values["deferred_allocation"]:
+            raise ValueError(
+                "ALLOCATION_BATCH_WINDOW cannot be used together "
+                "with DEFERRED_ALLOCATION."
+            )
+        return values
+
 
 settings = Settings()
@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import Column, Integer, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine
+)
 from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
 
+SQLITE_MEMORY_DATABASES = (None, "", ":memory:")
+
 
 class PreBase:
 
@@ -16,7 +24,65 @@ class PreBase:
 
 Base = declarative_base(cls=PreBase)
 
-engine = create_async_engine(settings.database_url)
+
+def sqlite_pragmas() -> dict:
+    """Return the configured SQLite pragmas, leaving out the unset ones."""
+    pragmas = {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "busy_timeout": settings.sqlite_busy_timeout,
+        "mmap_size": settings.sqlite_mmap_size,
+        "cache_size": settings.sqlite_cache_size,
+    }
+    return {
+        name: value for name, value in pragmas.items() if value is not None
+    }
+
+
+def pool_options(database_url: str) -> dict:
+    """
+    Return the connection pool options of the engine.
+
+    SQLite databases in a file get a queue pool as well instead of
+    opening a connection per session, so the pragmas are applied once
+    per connection; in-memory databases keep their single connection.
+    """
+    url = make_url(database_url)
+    options = {
+        "pool_pre_ping": settings.pool_pre_ping,
+        "pool_recycle": settings.pool_recycle,
+    }
+    if url.get_backend_name() == "sqlite":
+        if url.database in SQLITE_MEMORY_DATABASES:
+            return options
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return {
+        **options,
+        "pool_size": settings.pool_size,
+        "max_overflow": settings.pool_max_overflow,
+        "pool_timeout": settings.pool_timeout,
+    }
+
+
+def create_db_engine(database_url: str) -> AsyncEngine:
+    """Create the engine with the configured pool and SQLite pragmas."""
+    db_engine = create_async_engine(
+        database_url, **pool_options(database_url)
+    )
+    pragmas = sqlite_pragmas()
+    if db_engine.dialect.name == "sqlite" and pragmas:
+
+        @event.listens_for(db_engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return db_engine
+
+
+engine = create_db_engine(settings.database_url)
 
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession)
 
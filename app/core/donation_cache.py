@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, TypeVar
+from uuid import uuid4
+
+from app.core.config import settings
+
+SummaryType = TypeVar("SummaryType")
+
+
+class DonationSummaryCache:
+    """
+    Process-local cache of the users' donation summaries.
+
+    Every user has a version bumped whenever their donations change,
+    and all users share a generation bumped when an allocation changes
+    the donations of users unknown to the caller. Both are part of the
+    ETag, so a request can be answered with 304 before any query, and
+    summaries are cached by ETag, so an outdated one is never served.
+    Only the ``max_size`` most recently used summaries are kept.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._instance = uuid4().hex[:8]
+        self._generation = 0
+        self._versions: dict[int, int] = {}
+        self._summaries: OrderedDict[int, tuple[str, object]] = OrderedDict()
+
+    def etag(self, user_id: int, variant: str = "summary") -> str:
+        """Return the ETag of a view of the user's donations."""
+        return (
+            f'W/"{self._instance}.{self._generation}.'
+            f'{self._versions.get(user_id, 0)}.{variant}"'
+        )
+
+    def invalidate_users(self, user_ids: Iterable[int]) -> None:
+        """Mark the donations of the given users as changed."""
+        for user_id in set(user_ids):
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._summaries.pop(user_id, None)
+
+    def invalidate_all(self) -> None:
+        """Mark the donations of every user as changed."""
+        self._generation += 1
+        self._summaries.clear()
+
+    async def get_summary(
+        self,
+        user_id: int,
+        load: Callable[[], Awaitable[SummaryType]],
+    ) -> tuple[str, SummaryType]:
+        """Return the ETag and the summary, loading it on a miss."""
+        etag = self.etag(user_id)
+        cached = self._summaries.get(user_id)
+        if cached is not None and cached[0] == etag:
+            self._summaries.move_to_end(user_id)
+            return cached
+        summary = await load()
+        if self.etag(user_id) == etag:
+            self._summaries[user_id] = (etag, summary)
+            self._summaries.move_to_end(user_id)
+            while len(self._summaries) > self.max_size:
+                self._summaries.popitem(last=False)
+        return etag, summary
+
+
+donation_cache = DonationSummaryCache(settings.donation_summary_cache_size)
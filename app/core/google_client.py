@@ -1,8 +1,21 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
 from aiogoogle import Aiogoogle
 from aiogoogle.auth.creds import ServiceAccountCreds
+from aiogoogle.auth.managers import ServiceAccountManager
+from aiogoogle.resource import GoogleAPI
+from aiogoogle.sessions.aiohttp_session import AiohttpSession
+from aiohttp import TCPConnector
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
 
 SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
@@ -22,9 +35,194 @@ INFO = {
     'client_x509_cert_url': settings.client_x509_cert_url
 }
 
+REPORT_APIS = (('sheets', 'v4'), ('drive', 'v3'))
+
 cred = ServiceAccountCreds(scopes=SCOPES, **INFO)
 
 
+class DiscoveryCache:
+    """
+    Process-wide cache of Google API discovery documents.
+
+    A discovered API is reused for ``ttl`` seconds. With a cache
+    directory the documents are also kept on disk, so a restarted
+    process and the tests need no discovery requests at all. When an
+    expired document cannot be refreshed, the stale copy is used.
+    """
+
+    def __init__(self, ttl: int, cache_dir: Optional[str] = None):
+        self.ttl = ttl
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._apis: dict[tuple[str, str], tuple[float, GoogleAPI]] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+    def _path(self, api_name: str, api_version: str) -> Path:
+        return self.cache_dir / f'{api_name}_{api_version}.json'
+
+    def _load(self, api_name: str, api_version: str) -> None:
+        """Put the document stored on disk, if any, in memory."""
+        if self.cache_dir is None:
+            return
+        path = self._path(api_name, api_version)
+        if path.is_file():
+            self._apis[api_name, api_version] = (
+                path.stat().st_mtime,
+                GoogleAPI(json.loads(path.read_text()))
+            )
+
+    def _store(
+        self, api_name: str, api_version: str, api: GoogleAPI
+    ) -> None:
+        self._apis[api_name, api_version] = (time.time(), api)
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._path(api_name, api_version).write_text(
+                json.dumps(api.discovery_document)
+            )
+
+    def _fresh(self, key: tuple[str, str]) -> Optional[GoogleAPI]:
+        fetched_at, api = self._apis.get(key, (0, None))
+        if time.time() - fetched_at < self.ttl:
+            return api
+        return None
+
+    async def discover(
+        self, wrapper_services: Aiogoogle, api_name: str, api_version: str
+    ) -> GoogleAPI:
+        """Return the discovered API, fetching it at most once per TTL."""
+        key = (api_name, api_version)
+        api = self._fresh(key)
+        if api is not None:
+            return api
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            if key not in self._apis:
+                self._load(api_name, api_version)
+            api = self._fresh(key)
+            if api is not None:
+                return api
+            try:
+                api = await wrapper_services.discover(api_name, api_version)
+            except Exception:
+                if key not in self._apis:
+                    raise
+                logger.exception(
+                    'Refreshing the %s %s discovery document failed, '
+                    'using the cached one.', api_name, api_version
+                )
+                return self._apis[key][1]
+            self._store(api_name, api_version, api)
+            return api
+
+    async def warm(self, wrapper_services: Aiogoogle) -> None:
+        """Load or fetch the documents of the APIs used by the report."""
+        for api_name, api_version in REPORT_APIS:
+            await self.discover(wrapper_services, api_name, api_version)
+
+
+discovery_cache = DiscoveryCache(
+    settings.google_discovery_ttl, settings.google_discovery_cache_dir
+)
+
+
+class PooledSession(AiohttpSession):
+    """
+    HTTP session shared by every Google request of the process.
+
+    Aiogoogle enters a session as a context manager around token
+    requests; entering and leaving this one is a no-op, so the pooled
+    connections stay open until ``close`` is called on shutdown.
+    """
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+class CachedTokenManager(ServiceAccountManager):
+    """
+    Service account manager reusing its access token until ``margin``
+    seconds before it expires and refreshing it once for all the
+    concurrent callers.
+    """
+
+    def __init__(self, *args, margin: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.margin = timedelta(seconds=margin)
+        self._refresh_lock = asyncio.Lock()
+
+    def _token_is_fresh(self) -> bool:
+        if not self._access_token or self._expires_at is None:
+            return False
+        expires_at = self._expires_at
+        if not isinstance(expires_at, datetime):
+            expires_at = datetime.fromisoformat(expires_at)
+        return datetime.utcnow() < expires_at - self.margin
+
+    async def refresh(self) -> None:
+        if self._token_is_fresh():
+            return
+        async with self._refresh_lock:
+            if self._token_is_fresh():
+                return
+            self._access_token = None
+            await super().refresh()
+
+
+class GoogleClient:
+    """Application-lifetime Aiogoogle client over a bounded pool."""
+
+    def __init__(
+        self, creds: ServiceAccountCreds, pool_size: int, token_margin: int
+    ):
+        self.creds = creds
+        self.pool_size = pool_size
+        self.token_margin = token_margin
+        self.aiogoogle: Optional[Aiogoogle] = None
+        self._session: Optional[PooledSession] = None
+
+    async def start(self) -> Aiogoogle:
+        """Open the connection pool unless it is already open."""
+        if self.aiogoogle is None:
+            self._session = PooledSession(
+                connector=TCPConnector(limit=self.pool_size)
+            )
+
+            def session_factory():
+                return self._session
+
+            self.aiogoogle = Aiogoogle(
+                session_factory=session_factory,
+                service_account_creds=self.creds
+            )
+            self.aiogoogle.service_account_manager = CachedTokenManager(
+                session_factory,
+                creds=self.creds,
+                margin=self.token_margin
+            )
+        return self.aiogoogle
+
+    async def stop(self) -> None:
+        """Close the pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+        self.aiogoogle = None
+
+
+google_client = GoogleClient(
+    cred, settings.google_pool_size, settings.google_token_refresh_margin
+)
+
+
+async def warm_discovery_cache() -> None:
+    """Fill the discovery cache at startup, logging instead of failing."""
+    try:
+        await discovery_cache.warm(await google_client.start())
+    except Exception:
+        logger.exception('Warming the Google discovery cache failed.')
+
+
 async def get_service():
-    async with Aiogoogle(service_account_creds=cred) as aiogoogle:
-        yield aiogoogle
+    yield await google_client.start()
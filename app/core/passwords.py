@@ -0,0 +1,63 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, TypeVar
+
+from fastapi_users.password import PasswordHelper
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+ResultType = TypeVar("ResultType")
+
+
+class PooledPasswordHelper(PasswordHelper):
+    """
+    bcrypt password helper running the hashing off the event loop.
+
+    Hashing and verification go to a pool of ``max_workers`` threads,
+    which bcrypt can keep busy in parallel as it releases the GIL, so a
+    burst of logins queues up there instead of stalling every other
+    request. With no workers the work runs inline, as before.
+    """
+
+    def __init__(self, rounds: int, max_workers: int):
+        super().__init__(CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds
+        ))
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def _run(self, func: Callable[[], ResultType]) -> ResultType:
+        if self.max_workers <= 0:
+            return func()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix="password"
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, func
+        )
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password on the pool."""
+        return await self._run(partial(self.hash, password))
+
+    async def verify_and_update_async(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        """Verify a password on the pool, rehashing an outdated hash."""
+        return await self._run(
+            partial(self.verify_and_update, plain_password, hashed_password)
+        )
+
+    def shutdown(self) -> None:
+        """Stop the worker threads; they are restarted on the next use."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_helper = PooledPasswordHelper(
+    settings.password_hash_rounds, settings.password_hash_workers
+)
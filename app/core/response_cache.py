@@ -0,0 +1,103 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+
+class ResponseCache(ABC):
+    """
+    Store of pre-serialised responses.
+
+    Only plain ``GET``, ``SET`` and ``INCR`` semantics are required,
+    so a Redis-compatible server can back it as well.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the value stored under ``key``, if any."""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None:
+        """Store ``value`` under ``key``."""
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """Increment the counter stored under ``key`` and return it."""
+
+
+class InMemoryResponseCache(ResponseCache):
+    """Process-local LRU cache keeping at most ``max_size`` responses."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._values: OrderedDict[str, bytes] = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+        value = self._values.get(key)
+        if value is not None:
+            self._values.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+RESPONSE_CACHE_BACKENDS = {
+    "memory": InMemoryResponseCache,
+}
+
+
+class CachedView:
+    """
+    Responses of one endpoint, invalidated all at once.
+
+    Keys embed the version of the view, so invalidation is a single
+    ``INCR`` and the outdated responses simply age out of the cache.
+    A reader takes the version before querying the database, so a
+    response built while the view was being invalidated is stored
+    under the old version and never served.
+    """
+
+    def __init__(self, cache: ResponseCache, namespace: str):
+        self.cache = cache
+        self.namespace = namespace
+
+    @property
+    def _version_key(self) -> str:
+        return f"{self.namespace}:version"
+
+    async def version(self) -> int:
+        """Return the current version of the view."""
+        version = await self.cache.get(self._version_key)
+        return int(version) if version is not None else 0
+
+    async def get(self, version: int, variant: str) -> Optional[bytes]:
+        """Return a cached response of the view."""
+        return await self.cache.get(f"{self.namespace}:{version}:{variant}")
+
+    async def set(self, version: int, variant: str, value: bytes) -> None:
+        """Cache a response of the view."""
+        await self.cache.set(
+            f"{self.namespace}:{version}:{variant}", value
+        )
+
+    async def invalidate(self) -> None:
+        """Make every cached response of the view outdated."""
+        await self.cache.incr(self._version_key)
+
+
+response_cache = RESPONSE_CACHE_BACKENDS[settings.response_cache_backend](
+    settings.response_cache_size
+)
+project_list_cache = CachedView(response_cache, "charityproject:list")
@@ -1,23 +1,31 @@
-from typing import Optional, Union
+from collections import OrderedDict
+from typing import Any, Optional, Union
 import logging
+import time
 
 from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import (
     BaseUserManager,
     FastAPIUsers,
     IntegerIDMixin,
     InvalidPasswordException,
+    exceptions,
 )
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
     JWTStrategy,
 )
+from fastapi_users.jwt import decode_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from app.core.config import settings
 from app.core.db import get_async_session
+from app.core.passwords import password_helper
 from app.models.user import User
 from app.schemas.user import UserCreate
 
@@ -33,11 +41,107 @@ async def get_user_db(session: AsyncSession = Depends(get_async_session)):
     yield SQLAlchemyUserDatabase(session, User)
 
 
+class UserCache:
+    """
+    Bounded cache of the users behind access tokens.
+
+    An entry lives for ``ttl`` seconds at most and never past the expiry
+    of its token. The entries of a user are dropped when the user is
+    updated in this process; other processes see the change within
+    ``ttl``. The least recently used entries beyond ``max_size`` are
+    evicted.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[
+            str, tuple[float, dict[str, Any]]
+        ] = OrderedDict()
+        self._tokens: dict[int, set[str]] = {}
+
+    def get(self, token: str) -> Optional[User]:
+        """Return a detached copy of the cached user of a token."""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, values = entry
+        if expires_at <= time.time():
+            self._drop(token)
+            return None
+        self._entries.move_to_end(token)
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, token: str, user: User, token_expiry: float) -> None:
+        """Cache the user of a token until the TTL or the token expires."""
+        if self.ttl <= 0:
+            return
+        values = {
+            attr.key: getattr(user, attr.key)
+            for attr in inspect(User).column_attrs
+        }
+        self._drop(token)
+        self._entries[token] = (
+            min(time.time() + self.ttl, token_expiry), values
+        )
+        self._tokens.setdefault(user.id, set()).add(token)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached token of a user."""
+        for token in self._tokens.pop(user_id, set()):
+            self._entries.pop(token, None)
+
+    def _drop(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        user_id = entry[1]["id"]
+        tokens = self._tokens.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[user_id]
+
+
+user_cache = UserCache(settings.user_cache_ttl, settings.user_cache_size)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """JWT strategy reading the users of recently seen tokens from cache."""
+
+    async def read_token(
+        self,
+        token: Optional[str],
+        user_manager: BaseUserManager[User, int],
+    ) -> Optional[User]:
+        if token is None:
+            return None
+        user = user_cache.get(token)
+        if user is not None:
+            return user
+        user = await super().read_token(token, user_manager)
+        if user is not None:
+            token_data = decode_jwt(
+                token,
+                self.decode_key,
+                self.token_audience,
+                algorithms=[self.algorithm]
+            )
+            user_cache.put(
+                token, user, token_data.get("exp", float("inf"))
+            )
+        return user
+
+
 bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
 
 
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(
+    return CachedJWTStrategy(
         secret=settings.secret,
         lifetime_seconds=LIFETIME_SECONDS
     )
@@ -51,6 +155,67 @@ auth_backend = AuthenticationBackend(
 
 
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
+    """
+    User manager hashing and verifying passwords on the pool
+    of ``password_helper`` instead of the event loop.
+    """
+
+    def __init__(self, user_db: SQLAlchemyUserDatabase):
+        super().__init__(user_db, password_helper)
+
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+        if await self.user_db.get_by_email(user_create.email) is not None:
+            raise exceptions.UserAlreadyExists()
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        user_dict["hashed_password"] = await password_helper.hash_async(
+            user_dict.pop("password")
+        )
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Hash anyway, so a missing user takes as long as a wrong
+            # password.
+            await password_helper.hash_async(credentials.password)
+            return None
+        verified, updated_password_hash = (
+            await password_helper.verify_and_update_async(
+                credentials.password, user.hashed_password
+            )
+        )
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(
+                user, {"hashed_password": updated_password_hash}
+            )
+        return user
+
+    async def _update(self, user: User, update_dict: dict[str, Any]) -> User:
+        if "password" in update_dict:
+            update_dict = dict(update_dict)
+            password = update_dict.pop("password")
+            await self.validate_password(password, user)
+            update_dict["hashed_password"] = await password_helper.hash_async(
+                password
+            )
+        return await super()._update(user, update_dict)
 
     async def validate_password(
         self,
@@ -73,6 +238,18 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     ):
         logger.info(f"User {user.email} has been registered.")
 
+    async def on_after_update(
+            self,
+            user: User,
+            update_dict: dict[str, Any],
+            request: Optional[Request] = None
+    ):
+        user_cache.invalidate_user(user.id)
+
+    async def delete(self, user: User) -> None:
+        await super().delete(user)
+        user_cache.invalidate_user(user.id)
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
@@ -1,18 +1,40 @@
-from typing import Generic, Optional, Type, TypeVar, Union, Any
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Generic,
+    Optional,
+    Type,
+    TypeVar,
+    Union
+)
 
 from pydantic import BaseModel
-from sqlalchemy import false, select
+from sqlalchemy import Column, false, inspect, select
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.encoders import jsonable_encoder
+from sqlalchemy.sql import Select
 
 from app.core.db import Base
+from app.crud.fund_stats import fund_stats_crud
 from app.models import User
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 
-SKIP = 0
 LIMIT = 100
+STREAM_CHUNK_SIZE = 1000
+
+
+async def commit_loaded(obj: Base, session: AsyncSession) -> None:
+    """
+    Commit the pending changes of ``obj`` keeping its values
+    instead of expiring them and reading the row back.
+    """
+    await session.flush()
+    session.expunge(obj)
+    await session.commit()
+    session.add(obj)
 
 
 class CRUDBase(Generic[ModelType, CreateSchemaType]):
@@ -20,6 +42,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType]):
 
     def __init__(self, model: Type[ModelType]):
         self.model = model
+        self.columns = frozenset(inspect(model).column_attrs.keys())
 
     async def get(
             self, obj_id: int,
@@ -32,28 +55,96 @@ class CRUDBase(Generic[ModelType, CreateSchemaType]):
         return obj.scalars().first()
 
     async def get_multi(
-        self, session: AsyncSession, skip: int = SKIP, limit: int = LIMIT
+        self, session: AsyncSession, after_id: int = 0, limit: int = LIMIT
     ) -> list[ModelType]:
-        """Retrieve a list of model objects with pagination support."""
-        db_objs = await session.execute(select(self.model).offset(
-            skip).limit(limit))
+        """
+        Retrieve a page of model objects following ``after_id``.
+
+        Pages are keyed on the primary key instead of an offset,
+        so a deep page costs as much as the first one.
+        """
+        db_objs = await session.execute(
+            self.paginate(select(self.model), after_id, limit)
+        )
         return db_objs.scalars().all()
 
+    async def get_multi_rows(
+        self,
+        session: AsyncSession,
+        columns: list[Column],
+        after_id: int = 0,
+        limit: int = LIMIT,
+    ) -> list[Row]:
+        """Retrieve the chosen columns of a page following ``after_id``."""
+        rows = await session.execute(
+            self.paginate(select(*columns), after_id, limit)
+        )
+        return rows.all()
+
+    def paginate(self, stmt: Select, after_id: int, limit: int) -> Select:
+        """Restrict ``stmt`` to the page of objects following ``after_id``."""
+        return (
+            stmt
+            .where(self.model.id > after_id)
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+
+    async def stream(
+        self,
+        session: AsyncSession,
+        columns: list[Column],
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        fully_invested: Optional[bool] = None,
+    ) -> AsyncIterator[Row]:
+        """
+        Yield the chosen columns of the matching objects in id order
+        through a server-side cursor, one chunk in memory at a time.
+        """
+        stmt = select(*columns).order_by(self.model.id)
+        if created_from is not None:
+            stmt = stmt.where(self.model.create_date >= created_from)
+        if created_to is not None:
+            stmt = stmt.where(self.model.create_date < created_to)
+        if fully_invested is not None:
+            stmt = stmt.where(self.model.fully_invested == fully_invested)
+        result = await session.stream(
+            stmt.execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            for row in rows:
+                yield row
+
     async def create(
         self, data: CreateSchemaType,
         session: AsyncSession,
-        user: Optional[User] = None
+        user: Optional[User] = None,
+        commit: bool = True,
     ) -> ModelType:
-        """Create a model object and save it to the database."""
+        """
+        Create a model object and save it to the database.
+
+        With ``commit=False`` the object is only flushed, so the caller
+        can finish the unit of work and commit it once.
+        """
         new_obj_data = data.dict()
         if user is not None:
             new_obj_data["user_id"] = user.id
         new_obj = self.model(**new_obj_data)
         session.add(new_obj)
+        await fund_stats_crud.add(session, **self.created_stats(new_obj))
+        if not commit:
+            await session.flush()
+            return new_obj
         await session.commit()
         await session.refresh(new_obj)
         return new_obj
 
+    def created_stats(self, obj: ModelType) -> dict[str, int]:
+        """Return the changes of the fund totals made by creating ``obj``."""
+        return {}
+
     async def get_active_objs(self, session: AsyncSession) -> list[ModelType]:
         """Retrieve a list of active model objects."""
         active_objs = await session.execute(
@@ -70,15 +161,17 @@ class CRUDBase(Generic[ModelType, CreateSchemaType]):
         session: AsyncSession,
     ) -> ModelType:
         """Update a model object in the database."""
-        obj_data = jsonable_encoder(db_obj)
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        self.set_columns(db_obj, update_data)
         session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        await commit_loaded(db_obj, session)
         return db_obj
+
+    def set_columns(self, db_obj: ModelType, data: dict[str, Any]) -> None:
+        """Copy the values of the model columns found in ``data``."""
+        for field, value in data.items():
+            if field in self.columns:
+                setattr(db_obj, field, value)
@@ -1,46 +1,59 @@
 from typing import Optional
 from datetime import datetime
 
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select, func
+from sqlalchemy import select, true
+from sqlalchemy.sql import Select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crud.base import CRUDBase
-from app.models import CharityProject
-from app.schemas import CharityProjectUpdate
+from app.core.response_cache import project_list_cache
+from app.crud.base import CRUDBase, commit_loaded
+from app.crud.fund_stats import fund_stats_crud
+from app.models import CharityProject, User
+from app.schemas import CharityProjectCreate, CharityProjectUpdate
 
 
 class CRUDCharityProject(CRUDBase[CharityProject, CharityProjectUpdate]):
     """Class for implementing unique methods of the CharityProject model."""
 
+    def created_stats(self, obj: CharityProject) -> dict[str, int]:
+        return {"open_projects": 1}
+
+    async def create(
+        self, data: CharityProjectCreate,
+        session: AsyncSession,
+        user: Optional[User] = None,
+        commit: bool = True,
+    ) -> CharityProject:
+        project = await super().create(data, session, user, commit)
+        if commit:
+            await project_list_cache.invalidate()
+        return project
+
     async def update(
         self, db_obj: CharityProject,
         data: CharityProjectUpdate,
         session: AsyncSession
     ) -> CharityProject:
         """Make changes to a charity project."""
-        old_obj_data = jsonable_encoder(db_obj)
-        new_obj_data = data.dict(exclude_unset=True)
-
-        for field in old_obj_data:
-            if field in new_obj_data:
-                setattr(db_obj, field, new_obj_data[field])
-
+        self.set_columns(db_obj, data.dict(exclude_unset=True))
         if db_obj.invested_amount >= db_obj.full_amount:
-            db_obj.fully_invested = True
-            db_obj.close_date = datetime.now()
+            db_obj.close(datetime.now())
+            await fund_stats_crud.add(session, open_projects=-1)
 
         session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        await commit_loaded(db_obj, session)
+        await project_list_cache.invalidate()
         return db_obj
 
     async def delete(
         self, db_obj: CharityProject, session: AsyncSession
     ) -> CharityProject:
         """Delete a charity project."""
+        if not db_obj.fully_invested:
+            await fund_stats_crud.add(session, open_projects=-1)
         await session.delete(db_obj)
         await session.commit()
+        await project_list_cache.invalidate()
         return db_obj
 
     async def get_project_id_by_name(
@@ -52,23 +65,66 @@ class CRUDCharityProject(CRUDBase[CharityProject, CharityProjectUpdate]):
         )
         return project_id.scalars().first()
 
+    def _completion_rate_stmt(
+        self,
+        columns: list,
+        limit: Optional[int] = None,
+        closed_from: Optional[datetime] = None,
+        closed_to: Optional[datetime] = None,
+        name_prefix: Optional[str] = None,
+    ) -> Select:
+        """
+        Select the closed projects sorted by the speed of fundraising,
+        optionally within a close date window and by a name prefix.
+        """
+        stmt = select(*columns).where(self.model.fully_invested == true())
+        if closed_from is not None:
+            stmt = stmt.where(self.model.close_date >= closed_from)
+        if closed_to is not None:
+            stmt = stmt.where(self.model.close_date < closed_to)
+        if name_prefix:
+            stmt = stmt.where(
+                self.model.name.startswith(name_prefix, autoescape=True)
+            )
+        return (
+            stmt
+            .order_by(self.model.duration, self.model.id)
+            .limit(limit)
+        )
+
     async def get_projects_by_completion_rate(
-        self, session: AsyncSession
+        self, session: AsyncSession, **filters
     ) -> list[CharityProject]:
         """
         Return a list of closed projects
         sorted by the speed of fundraising.
         """
-        stmt = (
-            select(self.model)
-            .where(self.model.fully_invested.is_(True))
-            .order_by(
-                func.julianday(self.model.close_date) -
-                func.julianday(self.model.create_date)
-            )
+        projects = await session.execute(
+            self._completion_rate_stmt([self.model], **filters)
         )
-        projects = await session.execute(stmt)
         return projects.scalars().all()
 
+    async def get_completion_rate_rows(
+        self, session: AsyncSession, **filters
+    ) -> list[dict]:
+        """
+        Return only the report columns of the closed projects
+        sorted by the speed of fundraising.
+        """
+        rows = await session.execute(
+            self._completion_rate_stmt(
+                [
+                    self.model.id,
+                    self.model.name,
+                    self.model.description,
+                    self.model.create_date,
+                    self.model.close_date,
+                    self.model.duration,
+                ],
+                **filters
+            )
+        )
+        return rows.mappings().all()
+
 
 charity_project_crud = CRUDCharityProject(CharityProject)
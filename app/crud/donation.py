@@ -1,31 +1,92 @@
-from sqlalchemy import select
+from typing import Optional
+
+from sqlalchemy import Column, func, select
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crud.base import CRUDBase
+from app.core.donation_cache import donation_cache
+from app.crud.base import LIMIT, CRUDBase
+from app.models import User
 from app.models.donation import Donation
-from app.schemas.donation import DonationCreate
+from app.schemas.donation import DonationCreate, DonationSummary
+
+LAST_DONATIONS = 10
 
 
 class CRUDDonation(CRUDBase[Donation, DonationCreate]):
     """Class for implementing unique methods of the Donation model."""
 
+    def created_stats(self, obj: Donation) -> dict[str, int]:
+        return {"total_raised": obj.full_amount}
+
+    async def create(
+        self, data: DonationCreate,
+        session: AsyncSession,
+        user: Optional[User] = None,
+        commit: bool = True,
+    ) -> Donation:
+        donation = await super().create(data, session, user, commit)
+        if commit:
+            donation_cache.invalidate_users([donation.user_id])
+        return donation
+
     async def get_user_donations(
-        self, user_id: int, session: AsyncSession
+        self,
+        user_id: int,
+        session: AsyncSession,
+        after_id: int = 0,
+        limit: int = LIMIT,
     ) -> list[Donation]:
-        """Retrieve a list of donations made by the user."""
-        donations = await session.execute(
-            select(self.model).where(self.model.user_id == user_id)
-        )
+        """Retrieve a page of donations made by the user."""
+        donations = await session.execute(self.paginate(
+            select(self.model).where(self.model.user_id == user_id),
+            after_id, limit
+        ))
         return donations.scalars().all()
 
-    async def get_active_donations(
-            self, session: AsyncSession
-    ) -> list[Donation]:
-        """Retrieve a list of active donations."""
-        donations = await session.execute(
-            select(self.model).where(self.model.fully_invested is False)
+    async def get_user_donation_rows(
+        self,
+        user_id: int,
+        session: AsyncSession,
+        columns: list[Column],
+        after_id: int = 0,
+        limit: int = LIMIT,
+    ) -> list[Row]:
+        """Retrieve the chosen columns of a page of the user's donations."""
+        rows = await session.execute(self.paginate(
+            select(*columns).where(self.model.user_id == user_id),
+            after_id, limit
+        ))
+        return rows.all()
+
+    async def get_user_summary(
+        self,
+        user_id: int,
+        session: AsyncSession,
+        last_count: int = LAST_DONATIONS,
+    ) -> DonationSummary:
+        """Count and total the user's donations and take the latest ones."""
+        totals = await session.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(self.model.full_amount), 0),
+                func.coalesce(func.sum(self.model.invested_amount), 0),
+            )
+            .where(self.model.user_id == user_id)
+        )
+        count, total_amount, invested_amount = totals.one()
+        last_donations = await session.execute(
+            select(self.model)
+            .where(self.model.user_id == user_id)
+            .order_by(self.model.id.desc())
+            .limit(last_count)
+        )
+        return DonationSummary(
+            count=count,
+            total_amount=total_amount,
+            invested_amount=invested_amount,
+            last_donations=last_donations.scalars().all(),
         )
-        return donations.scalars().all()
 
 
 donation_crud = CRUDDonation(Donation)
@@ -0,0 +1,87 @@
+from typing import Optional
+
+from sqlalchemy import false, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CharityProject, Donation, FundStats
+from app.models.fund_stats import FUND_STATS_ID
+
+FUND_STATS_FIELDS = ("total_raised", "total_invested", "open_projects")
+
+
+class CRUDFundStats:
+    """Class for maintaining the fund-wide totals."""
+
+    def __init__(self, model=FundStats):
+        self.model = model
+
+    async def add(self, session: AsyncSession, **changes: int) -> None:
+        """
+        Add ``changes`` to the totals within the caller's transaction.
+
+        The first write to a database without the totals row creates it
+        from a full recount, which already includes the caller's writes.
+        Every write goes through this one row, so it also serialises
+        the transactions changing the totals.
+        """
+        changes = {name: value for name, value in changes.items() if value}
+        if not changes:
+            return
+        result = await session.execute(
+            update(self.model)
+            .where(self.model.id == FUND_STATS_ID)
+            .values(**{
+                name: getattr(self.model, name) + value
+                for name, value in changes.items()
+            })
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return
+        await session.flush()
+        totals = await self.compute(session)
+        try:
+            async with session.begin_nested():
+                session.add(self.model(id=FUND_STATS_ID, **totals))
+        except IntegrityError:
+            # A concurrent transaction has created the row first
+            # and its recount could not see these changes.
+            await self.add(session, **changes)
+
+    async def get(self, session: AsyncSession) -> Optional[dict]:
+        """Return the stored totals, if they have been recorded yet."""
+        row = await session.execute(
+            select(*(getattr(self.model, name) for name in FUND_STATS_FIELDS))
+            .where(self.model.id == FUND_STATS_ID)
+        )
+        row = row.first()
+        return None if row is None else dict(zip(FUND_STATS_FIELDS, row))
+
+    async def save(self, session: AsyncSession, totals: dict) -> None:
+        """Overwrite the stored totals and commit."""
+        await session.merge(self.model(id=FUND_STATS_ID, **totals))
+        await session.commit()
+
+    async def compute(self, session: AsyncSession) -> dict:
+        """Recount the totals from the projects and donations tables."""
+        donations = await session.execute(
+            select(
+                func.coalesce(func.sum(Donation.full_amount), 0),
+                func.coalesce(func.sum(Donation.invested_amount), 0),
+            )
+        )
+        total_raised, total_invested = donations.one()
+        open_projects = await session.execute(
+            select(func.count())
+            .select_from(CharityProject)
+            .where(CharityProject.fully_invested == false())
+        )
+        return {
+            "total_raised": total_raised,
+            "total_invested": total_invested,
+            "open_projects": open_projects.scalar_one(),
+        }
+
+
+fund_stats_crud = CRUDFundStats()
@@ -1,8 +1,19 @@
-from fastapi import FastAPI
+from http import HTTPStatus
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
 
 from app.core.config import settings
 from app.api.routers import main_router
+from app.core.google_client import google_client, warm_discovery_cache
 from app.core.init_db import create_first_superuser
+from app.core.passwords import password_helper
+from app.services.allocation_queue import (
+    allocation_worker,
+    donation_batcher
+)
+from app.services.report_jobs import report_jobs
 
 
 app = FastAPI(title=settings.app_title)
@@ -10,6 +21,34 @@ app = FastAPI(title=settings.app_title)
 app.include_router(main_router)
 
 
+@app.exception_handler(StaleDataError)
+async def stale_data_exception_handler(
+        request: Request, exc: StaleDataError
+):
+    """Report an update that lost a race with a concurrent request."""
+    return JSONResponse(
+        status_code=HTTPStatus.CONFLICT,
+        content={
+            "detail": "The object was changed by another request, "
+                      "please try again!"
+        },
+    )
+
+
 @app.on_event("startup")
 async def startup():
     await create_first_superuser()
+    await google_client.start()
+    if settings.google_discovery_cache_dir:
+        await warm_discovery_cache()
+    if settings.deferred_allocation:
+        await allocation_worker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await report_jobs.stop()
+    await donation_batcher.stop()
+    await allocation_worker.stop()
+    await google_client.stop()
+    password_helper.shutdown()
@@ -1,3 +1,5 @@
 from .charity_project import CharityProject # noqa
 from .donation import Donation # noqa
+from .fund_stats import FundStats # noqa
+from .report_spreadsheet import ReportSpreadsheet # noqa
 from .user import User # noqa
@@ -1,9 +1,70 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    column,
+    false,
+    true
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import declared_attr
+from sqlalchemy.sql.functions import FunctionElement
 
 from app.core.db import Base
 
+INITIAL_VERSION = 1
+
+
+class seconds_between(FunctionElement):
+    """
+    Seconds from the first datetime expression to the second,
+    both truncated to whole seconds.
+    """
+
+    type = Integer()
+    name = "seconds_between"
+    inherit_cache = True
+
+
+@compiles(seconds_between)
+def _seconds_between(element, compiler, **kw):
+    start, end = (compiler.process(arg, **kw) for arg in element.clauses)
+    return (
+        f"CAST(EXTRACT(EPOCH FROM date_trunc('second', {end})) - "
+        f"EXTRACT(EPOCH FROM date_trunc('second', {start})) AS INTEGER)"
+    )
+
+
+@compiles(seconds_between, "sqlite")
+def _seconds_between_sqlite(element, compiler, **kw):
+    start, end = (compiler.process(arg, **kw) for arg in element.clauses)
+    return (
+        f"CAST(strftime('%s', {end}) AS INTEGER) - "
+        f"CAST(strftime('%s', {start}) AS INTEGER)"
+    )
+
+
+def fully_invested_is(value: bool) -> dict:
+    """Return the dialect options making an index partial."""
+    condition = column("fully_invested") == (true() if value else false())
+    return {"sqlite_where": condition, "postgresql_where": condition}
+
+
+def open_rows_index(table_name: str) -> Index:
+    """
+    Cover the FIFO scans over the open rows in id order,
+    so they never touch the closed part of the table.
+    """
+    return Index(
+        f"ix_{table_name}_open",
+        "id", "full_amount", "invested_amount", "version",
+        **fully_invested_is(False)
+    )
+
 
 class BaseCharityModel(Base):
     """Abstract base model for application models."""
@@ -14,3 +75,23 @@ class BaseCharityModel(Base):
     fully_invested = Column(Boolean, default=False)
     create_date = Column(DateTime, default=datetime.utcnow)
     close_date = Column(DateTime, nullable=True, default=None)
+    version = Column(Integer, nullable=False, default=INITIAL_VERSION)
+
+    @declared_attr
+    def __mapper_args__(cls):
+        """Reject ORM updates made over a stale copy of the row."""
+        return {"version_id_col": cls.version}
+
+    @classmethod
+    def closing_values(cls, close_date: datetime) -> dict:
+        """Return the column values of rows an UPDATE fully invests."""
+        return {
+            "invested_amount": cls.full_amount,
+            "fully_invested": true(),
+            "close_date": close_date,
+        }
+
+    def close(self, close_date: datetime) -> None:
+        """Mark the object as fully invested."""
+        self.fully_invested = True
+        self.close_date = close_date
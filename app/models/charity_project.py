@@ -1,15 +1,48 @@
-from sqlalchemy import Column, String, Text
+from datetime import datetime
 
-from app.models.base import BaseCharityModel
+from sqlalchemy import Column, Index, Integer, String, Text
+
+from app.models.base import (
+    BaseCharityModel,
+    fully_invested_is,
+    open_rows_index,
+    seconds_between
+)
 
 
 class CharityProject(BaseCharityModel):
     """"Charity project model."""
 
     __tablename__ = "charityproject"
+    __table_args__ = (
+        open_rows_index(__tablename__),
+        Index(
+            "ix_charityproject_closed", "close_date", "create_date",
+            **fully_invested_is(True)
+        ),
+        Index(
+            "ix_charityproject_duration", "duration",
+            **fully_invested_is(True)
+        ),
+    )
 
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text, nullable=False)
+    duration = Column(Integer, nullable=True)
+
+    @classmethod
+    def closing_values(cls, close_date: datetime) -> dict:
+        return {
+            **super().closing_values(close_date),
+            "duration": seconds_between(cls.create_date, close_date),
+        }
+
+    def close(self, close_date: datetime) -> None:
+        super().close(close_date)
+        started = self.create_date.replace(microsecond=0)
+        self.duration = int(
+            (close_date.replace(microsecond=0) - started).total_seconds()
+        )
 
     def __repr__(self) -> str:
         return self.name
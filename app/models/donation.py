@@ -1,12 +1,15 @@
 from sqlalchemy import Column, ForeignKey, Integer, Text
 
-from app.models.base import BaseCharityModel
+from app.models.base import BaseCharityModel, open_rows_index
 
 
 class Donation(BaseCharityModel):
     """Fundraising donation model."""
 
     __tablename__ = "donation"
+    __table_args__ = (open_rows_index(__tablename__),)
 
-    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("user.id"), nullable=False, index=True
+    )
     comment = Column(Text, nullable=True)
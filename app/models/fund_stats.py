@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer
+
+from app.core.db import Base
+
+FUND_STATS_ID = 1
+
+
+class FundStats(Base):
+    """
+    Fund-wide totals kept in a single row and updated by every write
+    to projects and donations in the same transaction.
+    """
+
+    total_raised = Column(Integer, nullable=False, default=0)
+    total_invested = Column(Integer, nullable=False, default=0)
+    open_projects = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, Text
+
+from app.core.db import Base
+
+
+class ReportSpreadsheet(Base):
+    """Google Sheets report kept up to date for one owner."""
+
+    owner_email = Column(String(320), unique=True, nullable=False)
+    spreadsheet_id = Column(String(100), nullable=False)
+    values = Column(Text, nullable=False, default="[]")
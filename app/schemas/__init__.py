@@ -1,3 +1,6 @@
-from .charity_project import CharityProjectCreate, CharityProjectDB, CharityProjectUpdate # noqa
-from .donation import DonationCreate, DonationFullDB, DonationShortDB  # noqa
+from .allocation import AllocationStatus  # noqa
+from .charity_project import CharityProjectCreate, CharityProjectDB, CharityProjectReport, CharityProjectUpdate # noqa
+from .donation import DonationCreate, DonationFullDB, DonationImport, DonationImportResult, DonationShortDB, DonationSummary  # noqa
+from .fund_stats import FundStatsDB  # noqa
+from .report_job import ReportJob  # noqa
 from .user import UserCreate, UserRead, UserUpdate  # noqa
@@ -0,0 +1,16 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class AllocationStatus(BaseModel):
+    """Pydantic schema for the progress of deferred allocation."""
+
+    enabled: bool
+    running: bool
+    pending: int
+    processed: int
+    passes: int
+    last_pass_date: Optional[datetime]
+    last_error: Optional[str]
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Extra, Field, PositiveInt, validator
@@ -91,3 +92,14 @@ class CharityProjectCreate(CharityProjectBase):
 
 class CharityProjectDB(CharityProjectBase, BaseDB):
     """Pydantic schema for representing a charity project."""
+
+
+class CharityProjectReport(BaseModel):
+    """Pydantic schema for a row of the completion speed report."""
+
+    id: int
+    name: str
+    description: str
+    create_date: datetime
+    close_date: datetime
+    duration: int
@@ -14,6 +14,23 @@ class DonationCreate(BaseModel):
     comment: Optional[str] = None
 
 
+class DonationImport(DonationCreate):
+    """Pydantic schema for a donation imported on behalf of a user."""
+    user_id: PositiveInt
+
+
+class DonationImportError(BaseModel):
+    """Pydantic schema for a rejected row of a donation import."""
+    row: int
+    detail: str
+
+
+class DonationImportResult(BaseModel):
+    """Pydantic schema for the outcome of a donation import."""
+    imported: int
+    errors: list[DonationImportError] = []
+
+
 class DonationFullDB(DonationCreate, BaseDB):
     """Pydantic schema for representing full donation details."""
     user_id: int
@@ -29,3 +46,11 @@ class DonationShortDB(DonationCreate):
 
     class Config:
         orm_mode = True
+
+
+class DonationSummary(BaseModel):
+    """Pydantic schema for the totals and latest donations of a user."""
+    count: int
+    total_amount: int
+    invested_amount: int
+    last_donations: list[DonationShortDB]
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class FundStatsDB(BaseModel):
+    """Pydantic schema for the fund-wide totals."""
+
+    total_raised: int
+    total_invested: int
+    open_projects: int
+    unallocated_amount: int
@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ReportJob(BaseModel):
+    """Pydantic schema for a background report generation job."""
+
+    id: str
+    status: str
+    created_date: datetime
+    finished_date: Optional[datetime]
+    written_rows: int = 0
+    total_rows: Optional[int]
+    spreadsheet_url: Optional[str]
+    error: Optional[str]
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import partial
+from typing import Callable, Optional, Union
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.donation_cache import donation_cache
+from app.core.response_cache import project_list_cache
+from app.crud.base import CRUDBase
+from app.models import CharityProject, Donation, User
+from app.schemas import DonationCreate
+from app.services.investment import (
+    allocate,
+    allocate_open_objects,
+    create_and_allocate,
+    fill_new_donations,
+    run_with_retries
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 1000
+FAILED_PASS_DELAY = 1.0
+
+QueueItem = tuple[str, int]
+
+
+class AllocationQueue(ABC):
+    """Queue of ``(model name, id)`` pairs waiting for allocation."""
+
+    @abstractmethod
+    async def put(self, item: QueueItem) -> None:
+        """Add an object to the queue."""
+
+    @abstractmethod
+    async def get_batch(self, max_items: int) -> list[QueueItem]:
+        """Wait for at least one item and return up to ``max_items``."""
+
+    @abstractmethod
+    def task_done(self, count: int) -> None:
+        """Mark ``count`` items returned by ``get_batch`` as processed."""
+
+    @abstractmethod
+    async def join(self) -> None:
+        """Wait until every queued item has been processed."""
+
+    @abstractmethod
+    def qsize(self) -> int:
+        """Return the number of items waiting in the queue."""
+
+
+class InMemoryAllocationQueue(AllocationQueue):
+    """Process-local queue backed by ``asyncio.Queue``."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue[QueueItem] = asyncio.Queue()
+
+    async def put(self, item: QueueItem) -> None:
+        await self._queue.put(item)
+
+    async def get_batch(self, max_items: int) -> list[QueueItem]:
+        batch = [await self._queue.get()]
+        while len(batch) < max_items and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    def task_done(self, count: int) -> None:
+        for _ in range(count):
+            self._queue.task_done()
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+
+QUEUE_BACKENDS = {
+    "memory": InMemoryAllocationQueue,
+}
+
+
+class AllocationWorker:
+    """
+    Background task allocating queued projects and donations.
+
+    Everything queued while a pass is running is picked up by the next
+    pass, so a burst of new objects is allocated in a few coalesced
+    passes instead of one transaction per object.
+    """
+
+    def __init__(
+        self,
+        queue: AllocationQueue,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ):
+        self.queue = queue
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.processed = 0
+        self.passes = 0
+        self.last_pass_date: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._current_batch: list[QueueItem] = []
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Start consuming the queue."""
+        if not self.is_running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker and allocate whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        batch, self._current_batch = self._current_batch, []
+        if self.queue.qsize():
+            batch.extend(await self.queue.get_batch(self.queue.qsize()))
+        if batch:
+            try:
+                await self._allocate_batch(batch)
+            except Exception as error:
+                logger.exception("Final allocation pass failed.")
+                self.last_error = str(error)
+            self.queue.task_done(len(batch))
+
+    async def enqueue(self, model_name: str, obj_id: int) -> None:
+        """
+        Queue a persisted object for allocation, starting the worker
+        if it is not running yet.
+        """
+        await self.queue.put((model_name, obj_id))
+        await self.start()
+
+    async def _allocate_batch(self, batch: list[QueueItem]) -> None:
+        """Run one allocation pass covering ``batch``."""
+        async with self.session_factory() as session:
+            await allocate_open_objects(session)
+        self.processed += len(batch)
+        self.passes += 1
+        self.last_pass_date = datetime.now()
+        self.last_error = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self.queue.get_batch(self.max_batch_size)
+            self._current_batch = batch
+            try:
+                await self._allocate_batch(batch)
+            except Exception as error:
+                logger.exception("Allocation pass failed.")
+                self.last_error = str(error)
+                for item in batch:
+                    await self.queue.put(item)
+                self._current_batch = []
+                self.queue.task_done(len(batch))
+                await asyncio.sleep(FAILED_PASS_DELAY)
+                continue
+            self._current_batch = []
+            self.queue.task_done(len(batch))
+
+    def status(self) -> dict:
+        """Return the allocation progress of the worker."""
+        return {
+            "enabled": settings.deferred_allocation,
+            "running": self.is_running,
+            "pending": self.queue.qsize(),
+            "processed": self.processed,
+            "passes": self.passes,
+            "last_pass_date": self.last_pass_date,
+            "last_error": self.last_error,
+        }
+
+
+class DonationBatcher:
+    """
+    Persist and allocate the donations arriving within a short window
+    in one transaction.
+
+    The donations of a batch are matched in the order they arrived
+    against one FIFO ledger of the open projects and inserted already
+    allocated, so each of them ends up exactly as if they had been
+    allocated one by one. Older open donations are left alone, as they
+    are by ``allocate``.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[..., AsyncSession] = AsyncSessionLocal,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, data: DonationCreate, user: User) -> Donation:
+        """Queue a donation and wait until its batch is committed."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(({**data.dict(), "user_id": user.id}, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(
+                settings.allocation_batch_window, self._start_flush
+            )
+        return await future
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._flush(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _persist(
+        self, batch: list[tuple[dict, asyncio.Future]], session: AsyncSession
+    ) -> list[Donation]:
+        """Allocate and insert a batch of donations and commit once."""
+        donations_data = [dict(obj_data) for obj_data, _ in batch]
+        await fill_new_donations(donations_data, session)
+        donations = [
+            Donation(**obj_data) for obj_data in donations_data
+        ]
+        session.add_all(donations)
+        await session.commit()
+        donation_cache.invalidate_users(
+            donation.user_id for donation in donations
+        )
+        if any(donation.invested_amount for donation in donations):
+            await project_list_cache.invalidate()
+        return donations
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            async with self.session_factory(
+                expire_on_commit=False
+            ) as session:
+                donations = await run_with_retries(
+                    partial(self._persist, batch, session), session
+                )
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            for (_, future), donation in zip(batch, donations):
+                if not future.done():
+                    future.set_result(donation)
+
+    async def stop(self) -> None:
+        """Flush the pending donations and wait for running batches."""
+        if self._pending:
+            self._start_flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+
+allocation_worker = AllocationWorker(
+    QUEUE_BACKENDS[settings.allocation_queue_backend]()
+)
+donation_batcher = DonationBatcher()
+
+
+async def schedule_allocation(
+    obj_to_invest: Union[CharityProject, Donation],
+    session: AsyncSession,
+) -> None:
+    """
+    Allocate a new project or donation right away or, in the deferred
+    allocation mode, leave it to the background worker.
+    """
+    if settings.deferred_allocation:
+        await allocation_worker.enqueue(
+            type(obj_to_invest).__name__, obj_to_invest.id
+        )
+    else:
+        await allocate(obj_to_invest, session)
+
+
+async def create_and_schedule(
+    crud: CRUDBase,
+    data: BaseModel,
+    session: AsyncSession,
+    user: Optional[User] = None,
+) -> Union[CharityProject, Donation]:
+    """
+    Create a project or donation and allocate it in the same transaction
+    or, in the deferred allocation mode, commit it and leave it to the
+    background worker.
+    """
+    if settings.deferred_allocation:
+        new_obj = await crud.create(data, session, user)
+        await allocation_worker.enqueue(type(new_obj).__name__, new_obj.id)
+        return new_obj
+    return await create_and_allocate(crud, data, session, user)
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from functools import partial
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.donation_cache import donation_cache
+from app.core.response_cache import project_list_cache
+from app.models import Donation, User
+from app.schemas import DonationImport, DonationImportResult
+from app.services.investment import fill_new_donations, run_with_retries
+
+CSV_MEDIA_TYPE = "text/csv"
+INSERT_CHUNK_SIZE = 1000
+
+
+def parse_records(body: bytes, content_type: str) -> list[dict]:
+    """Read the records of a JSON array or of a CSV file with a header."""
+    try:
+        if content_type.startswith(CSV_MEDIA_TYPE):
+            reader = csv.DictReader(io.StringIO(body.decode()))
+            return [
+                {key: value for key, value in row.items() if value != ""}
+                for row in reader
+            ]
+        records = json.loads(body)
+    except csv.Error as error:
+        raise ValueError(str(error))
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of donations.")
+    return records
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, item['loc']))}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+async def _existing_user_ids(
+    user_ids: set[int], session: AsyncSession
+) -> set[int]:
+    user_ids = sorted(user_ids)
+    existing = set()
+    for start in range(0, len(user_ids), INSERT_CHUNK_SIZE):
+        found = await session.execute(
+            select(User.id).where(
+                User.id.in_(user_ids[start:start + INSERT_CHUNK_SIZE])
+            )
+        )
+        existing.update(found.scalars().all())
+    return existing
+
+
+async def _insert_once(donations: list[dict], session: AsyncSession) -> None:
+    await fill_new_donations(donations, session)
+    for start in range(0, len(donations), INSERT_CHUNK_SIZE):
+        await session.execute(
+            insert(Donation), donations[start:start + INSERT_CHUNK_SIZE]
+        )
+    await session.commit()
+
+
+async def import_donations(
+    records: list, session: AsyncSession
+) -> DonationImportResult:
+    """
+    Insert the valid records as donations and allocate them in one pass.
+
+    Invalid records and records of unknown users are reported by their
+    1-based position and skipped; the rest are allocated from the open
+    projects in the order given and inserted with multi-row INSERTs
+    in a single transaction.
+    """
+    errors = []
+    valid = []
+    for row, record in enumerate(records, start=1):
+        try:
+            valid.append((row, DonationImport.parse_obj(record)))
+        except ValidationError as error:
+            errors.append({"row": row, "detail": _describe(error)})
+    known_users = await _existing_user_ids(
+        {donation.user_id for _, donation in valid}, session
+    )
+    donations = []
+    for row, donation in valid:
+        if donation.user_id not in known_users:
+            errors.append({"row": row, "detail": "User not found!"})
+            continue
+        donations.append(donation.dict())
+    if donations:
+        await run_with_retries(
+            partial(_insert_once, donations, session), session
+        )
+        donation_cache.invalidate_users(
+            donation["user_id"] for donation in donations
+        )
+        if any(donation["invested_amount"] for donation in donations):
+            await project_list_cache.invalidate()
+    errors.sort(key=lambda error: error["row"])
+    return DonationImportResult(imported=len(donations), errors=errors)
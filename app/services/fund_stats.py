@@ -0,0 +1,60 @@
+"""
+Recount the fund totals from the projects and donations tables
+and compare them with the stored ones.
+
+Usage:
+    python -m app.services.fund_stats [--fix]
+"""
+import argparse
+import asyncio
+import sys
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import AsyncSessionLocal
+from app.crud.fund_stats import fund_stats_crud
+
+
+async def check_fund_stats(
+    session: AsyncSession, fix: bool = False
+) -> dict[str, tuple[Optional[int], int]]:
+    """
+    Return the ``(stored, actual)`` values of the totals that differ
+    from a full recount, overwriting them with the recount if ``fix``.
+    """
+    stored = await fund_stats_crud.get(session) or {}
+    actual = await fund_stats_crud.compute(session)
+    mismatches = {
+        name: (stored.get(name), value)
+        for name, value in actual.items()
+        if stored.get(name) != value
+    }
+    if mismatches and fix:
+        await fund_stats_crud.save(session, actual)
+    return mismatches
+
+
+async def run_check(fix: bool) -> int:
+    async with AsyncSessionLocal() as session:
+        mismatches = await check_fund_stats(session, fix)
+    for name, (stored, actual) in mismatches.items():
+        print(f"{name}: stored {stored}, actual {actual}")
+    if not mismatches:
+        print("Fund totals are consistent.")
+        return 0
+    return 0 if fix else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--fix", action="store_true",
+        help="overwrite the stored totals with the recount"
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run_check(args.fix)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,55 @@
+import asyncio
+import json
 from copy import deepcopy
 from datetime import datetime
+from typing import Callable, Optional
 
 from aiogoogle import Aiogoogle
+from aiogoogle.excs import HTTPError
+from aiohttp import ClientError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.models import CharityProject
+from app.core.google_client import discovery_cache
+from app.models import CharityProject, ReportSpreadsheet
 
 FORMAT = "%Y/%m/%d %H:%M:%S"
 ROW_COUNT = 100
 COLUMN_COUNT = 100
+MAX_CELLS = 10_000_000
+SHEET_ID = 0
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 1.0
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/{spreadsheet_id}"
 SPREADSHEET_TITLE = "Report as of {date}"
+PERSISTENT_SPREADSHEET_TITLE = "Report on projects by completion speed"
 
+RowsRange = tuple[int, list[list]]
+ProgressCallback = Callable[[int, int], None]
 
-def generate_spreadsheet_body(date: str) -> dict:
+
+def generate_spreadsheet_body(
+        date: str,
+        title: Optional[str] = None,
+        row_count: int = ROW_COUNT,
+        column_count: int = COLUMN_COUNT,
+) -> dict:
     """Generate the request body for creating a spreadsheet."""
     return {
         "properties": {
-            "title": SPREADSHEET_TITLE.format(date=date),
+            "title": title or SPREADSHEET_TITLE.format(date=date),
             "locale": "ru_RU",
         },
         "sheets": [{
             "properties": {
                 "sheetType": "GRID",
-                "sheetId": 0,
+                "sheetId": SHEET_ID,
                 "title": "Sheet1",
                 "gridProperties": {
-                    "rowCount": ROW_COUNT,
-                    "columnCount": COLUMN_COUNT,
+                    "rowCount": row_count,
+                    "columnCount": column_count,
                 }
             }
         }]
@@ -48,7 +71,9 @@ async def spreadsheets_create(
     if spreadsheet_body is None:
         date_now = datetime.now().strftime(FORMAT)
         spreadsheet_body = generate_spreadsheet_body(date_now)
-    service = await wrapper_services.discover("sheets", "v4")
+    service = await discovery_cache.discover(
+        wrapper_services, "sheets", "v4"
+    )
     response = await wrapper_services.as_service_account(
         service.spreadsheets.create(json=spreadsheet_body)
     )
@@ -65,7 +90,9 @@ async def set_user_permissions(
         "role": "writer",
         "emailAddress": settings.email
     }
-    service = await wrapper_services.discover("drive", "v3")
+    service = await discovery_cache.discover(
+        wrapper_services, "drive", "v3"
+    )
     await wrapper_services.as_service_account(
         service.permissions.create(
             fileId=spreadsheetid,
@@ -75,18 +102,13 @@ async def set_user_permissions(
     )
 
 
-async def spreadsheets_update_value(
-        spreadsheetid: str,
-        projects: list[CharityProject],
-        wrapper_services: Aiogoogle
-) -> None:
-    """Update data in the Google Sheets spreadsheet."""
-    service = await wrapper_services.discover("sheets", "v4")
-    date_now = datetime.now().strftime(FORMAT)
+def build_table_values(
+        projects: list[CharityProject], date: str
+) -> list[list]:
+    """Build the report rows, header included."""
     table_header = deepcopy(TABLE_HEADER)
-    table_header[0][1] = date_now
-
-    table_values = [
+    table_header[0][1] = date
+    return [
         *table_header,
         *[
             [
@@ -99,27 +121,272 @@ async def spreadsheets_update_value(
         ],
     ]
 
+
+def check_table_size(table_values: list[list]) -> tuple[int, int]:
+    """Return the size of the table if it fits in one spreadsheet."""
     rows = len(table_values)
     cols = max(map(len, table_values))
 
-    if rows > ROW_COUNT or cols > COLUMN_COUNT:
+    if rows * cols > MAX_CELLS:
         raise ValueError(
             f"Table size exceeded. "
-            f"Rows generated: {rows}. Allowed: {ROW_COUNT}. "
-            f"Columns generated: {cols}. Allowed: {COLUMN_COUNT}. "
+            f"Cells generated: {rows * cols}. Allowed: {MAX_CELLS}."
         )
+    return rows, cols
 
-    update_body = {
-        "majorDimension": "ROWS",
-        "values": table_values
-    }
 
-    await wrapper_services.as_service_account(
-        service.spreadsheets.values.update(
+def changed_ranges(
+        old_values: list[list], new_values: list[list]
+) -> list[RowsRange]:
+    """
+    Return the ``(first row, rows)`` ranges where ``new_values`` differ
+    from ``old_values``, consecutive changed rows merged into one range.
+    Rows that are no longer in the table are overwritten with empty
+    cells. Row numbers start from 1, as in the spreadsheet.
+    """
+    cols = max(map(len, old_values + new_values), default=0)
+
+    def padded(values: list[list], index: int) -> list:
+        row = values[index] if index < len(values) else []
+        return [*row, *[""] * (cols - len(row))]
+
+    ranges = []
+    for index in range(max(len(old_values), len(new_values))):
+        row = padded(new_values, index)
+        if row == padded(old_values, index):
+            continue
+        if ranges and ranges[-1][0] + len(ranges[-1][1]) == index + 1:
+            ranges[-1][1].append(row)
+        else:
+            ranges.append((index + 1, [row]))
+    return ranges
+
+
+def split_into_chunks(
+        ranges: list[RowsRange], chunk_rows: int
+) -> list[list[RowsRange]]:
+    """Group the ranges into requests of at most ``chunk_rows`` rows."""
+    chunks = [[]]
+    size = 0
+    for first_row, rows in ranges:
+        for start in range(0, len(rows), chunk_rows):
+            part = rows[start:start + chunk_rows]
+            if size + len(part) > chunk_rows:
+                chunks.append([])
+                size = 0
+            chunks[-1].append((first_row + start, part))
+            size += len(part)
+    return [chunk for chunk in chunks if chunk]
+
+
+def apply_ranges(values: list[list], ranges: list[RowsRange]) -> None:
+    """Record written ranges in ``values``, dropping trailing blank rows."""
+    for first_row, rows in ranges:
+        for index, row in enumerate(rows, start=first_row - 1):
+            values.extend([] for _ in range(index + 1 - len(values)))
+            values[index] = row
+    while values and not any(values[-1]):
+        values.pop()
+
+
+async def _send_with_retries(wrapper_services: Aiogoogle, request) -> dict:
+    """
+    Send a request, retrying rate limited, failed and timed out calls
+    with an exponential backoff.
+    """
+    for number in range(WRITE_RETRIES + 1):
+        try:
+            return await wrapper_services.as_service_account(request)
+        except HTTPError as error:
+            status = getattr(error.res, "status_code", None)
+            if status not in RETRYABLE_STATUSES or number == WRITE_RETRIES:
+                raise
+        except (ClientError, asyncio.TimeoutError):
+            if number == WRITE_RETRIES:
+                raise
+        await asyncio.sleep(WRITE_RETRY_DELAY * 2 ** number)
+
+
+async def write_ranges(
+        spreadsheetid: str,
+        ranges: list[RowsRange],
+        wrapper_services: Aiogoogle,
+        written: Optional[list[list]] = None,
+        on_progress: Optional[ProgressCallback] = None,
+) -> None:
+    """
+    Write the ranges in ``values.batchUpdate`` requests of at most
+    GOOGLE_REPORT_CHUNK_ROWS rows each.
+
+    Every chunk acknowledged by Google is recorded in ``written``,
+    so after a failure the caller knows what is already in the sheet,
+    and reported to ``on_progress`` as rows written out of the total.
+    """
+    total_rows = sum(len(rows) for _, rows in ranges)
+    written_rows = 0
+    if on_progress is not None:
+        on_progress(written_rows, total_rows)
+    if not ranges:
+        return
+    service = await discovery_cache.discover(
+        wrapper_services, "sheets", "v4"
+    )
+    for chunk in split_into_chunks(
+        ranges, settings.google_report_chunk_rows
+    ):
+        await _send_with_retries(
+            wrapper_services,
+            service.spreadsheets.values.batchUpdate(
+                spreadsheetId=spreadsheetid,
+                json={
+                    "valueInputOption": "USER_ENTERED",
+                    "data": [
+                        {
+                            "range": f"R{first_row}C1:"
+                                     f"R{first_row + len(rows) - 1}"
+                                     f"C{len(rows[0])}",
+                            "majorDimension": "ROWS",
+                            "values": rows,
+                        }
+                        for first_row, rows in chunk
+                    ],
+                }
+            )
+        )
+        if written is not None:
+            apply_ranges(written, chunk)
+        written_rows += sum(len(rows) for _, rows in chunk)
+        if on_progress is not None:
+            on_progress(written_rows, total_rows)
+
+
+async def resize_grid(
+        spreadsheetid: str, row_count: int, wrapper_services: Aiogoogle
+) -> None:
+    """Set the number of rows of the report sheet."""
+    service = await discovery_cache.discover(
+        wrapper_services, "sheets", "v4"
+    )
+    await _send_with_retries(
+        wrapper_services,
+        service.spreadsheets.batchUpdate(
             spreadsheetId=spreadsheetid,
-            range=f"R1C1:R{rows}C{cols}",
-            valueInputOption="USER_ENTERED",
-            json=update_body
+            json={"requests": [{
+                "updateSheetProperties": {
+                    "properties": {
+                        "sheetId": SHEET_ID,
+                        "gridProperties": {"rowCount": row_count},
+                    },
+                    "fields": "gridProperties.rowCount",
+                }
+            }]}
+        )
+    )
+
+
+async def create_report(
+        projects: list[CharityProject],
+        wrapper_services: Aiogoogle,
+        on_progress: Optional[ProgressCallback] = None,
+) -> str:
+    """
+    Create a spreadsheet sized to the report, share it and fill it in.
+    """
+    date_now = datetime.now().strftime(FORMAT)
+    table_values = build_table_values(projects, date_now)
+    rows, cols = check_table_size(table_values)
+    spreadsheet_id = await spreadsheets_create(
+        wrapper_services,
+        generate_spreadsheet_body(
+            date_now,
+            row_count=max(rows, ROW_COUNT),
+            column_count=max(cols, COLUMN_COUNT),
+        )
+    )
+    await set_user_permissions(spreadsheet_id, wrapper_services)
+    await write_ranges(
+        spreadsheet_id, [(1, table_values)], wrapper_services,
+        on_progress=on_progress
+    )
+    return spreadsheet_id
+
+
+async def update_persistent_report(
+        projects: list[CharityProject],
+        session: AsyncSession,
+        wrapper_services: Aiogoogle,
+        on_progress: Optional[ProgressCallback] = None,
+) -> str:
+    """
+    Bring the report spreadsheet of the configured owner up to date
+    and return its id.
+
+    The spreadsheet is created and shared on the first call only.
+    The rows already in the sheet are kept in the database, so later
+    calls send just the changed ranges. They are saved even when a chunk
+    fails, so the next call resumes after the last acknowledged chunk.
+    """
+    if not settings.email:
+        raise ValueError("EMAIL must be set to keep a persistent report.")
+    report = await session.execute(
+        select(ReportSpreadsheet).where(
+            ReportSpreadsheet.owner_email == settings.email
         )
     )
+    report = report.scalars().first()
+    date_now = datetime.now().strftime(FORMAT)
+    table_values = build_table_values(projects, date_now)
+    rows, cols = check_table_size(table_values)
+    if report is None:
+        new_spreadsheet_id = await spreadsheets_create(
+            wrapper_services,
+            generate_spreadsheet_body(
+                date_now,
+                PERSISTENT_SPREADSHEET_TITLE,
+                row_count=max(rows, ROW_COUNT),
+                column_count=max(cols, COLUMN_COUNT),
+            )
+        )
+        await set_user_permissions(new_spreadsheet_id, wrapper_services)
+        report = ReportSpreadsheet(
+            owner_email=settings.email,
+            spreadsheet_id=new_spreadsheet_id,
+            values="[]"
+        )
+    spreadsheet_id = report.spreadsheet_id
+    written = json.loads(report.values)
+    try:
+        if rows > max(len(written), ROW_COUNT):
+            await resize_grid(spreadsheet_id, rows, wrapper_services)
+        await write_ranges(
+            spreadsheet_id,
+            changed_ranges(written, table_values),
+            wrapper_services,
+            written,
+            on_progress
+        )
+    finally:
+        report.values = json.dumps(written)
+        session.add(report)
+        # Keep the projects loaded for the response after the commit.
+        for project in projects:
+            session.expunge(project)
+        await session.commit()
+    return spreadsheet_id
 
+
+async def generate_report(
+        projects: list[CharityProject],
+        session: AsyncSession,
+        wrapper_services: Aiogoogle,
+        on_progress: Optional[ProgressCallback] = None,
+) -> str:
+    """
+    Write the report in the configured mode and return the id
+    of the spreadsheet holding it.
+    """
+    if settings.persistent_report:
+        return await update_persistent_report(
+            projects, session, wrapper_services, on_progress
+        )
+    return await create_report(projects, wrapper_services, on_progress)
@@ -1,9 +1,67 @@
+import asyncio
+import random
 from datetime import datetime
-from typing import Union
+from functools import partial
+from typing import Awaitable, Callable, Optional, Type, TypeVar, Union
 
+from pydantic import BaseModel
+from sqlalchemy import case, false, func, select, update
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.exc import StaleDataError
 
-from app.models import CharityProject, Donation
+from app.core.config import settings
+from app.core.donation_cache import donation_cache
+from app.core.response_cache import project_list_cache
+from app.crud.base import CRUDBase, commit_loaded
+from app.crud.fund_stats import fund_stats_crud
+from app.models import CharityProject, Donation, User
+from app.services.ledger import AllocationConflict, FIFOLedger
+
+LEDGER_MODE = "ledger"
+SET_BASED_MODE = "sql"
+RETRY_DELAY = 0.01
+
+CONFLICT_ERRORS = (AllocationConflict, StaleDataError, OperationalError)
+LOCK_ERROR_MESSAGE = "database is locked"
+LOCK_ERROR_SQLSTATES = ("40001", "40P01", "55P03")
+
+ResultType = TypeVar("ResultType")
+
+OPPOSITE_MODELS = {
+    CharityProject: Donation,
+    Donation: CharityProject,
+}
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Check whether an error means that the attempt lost a race:
+    a version conflict, a busy SQLite database, or a serialization
+    failure, deadlock or lock timeout reported by the backend.
+    """
+    if not isinstance(error, OperationalError):
+        return True
+    sqlstate = getattr(
+        error.orig, "sqlstate", getattr(error.orig, "pgcode", None)
+    )
+    return (
+        LOCK_ERROR_MESSAGE in str(error.orig) or
+        sqlstate in LOCK_ERROR_SQLSTATES
+    )
+
+
+async def expire_cached_views(
+    obj_to_invest: Union[CharityProject, Donation], invested: int
+) -> None:
+    """Expire the cached responses an allocation has changed."""
+    if isinstance(obj_to_invest, Donation):
+        donation_cache.invalidate_users([obj_to_invest.user_id])
+    elif invested:
+        donation_cache.invalidate_all()
+    if invested or isinstance(obj_to_invest, CharityProject):
+        await project_list_cache.invalidate()
 
 
 async def invest(
@@ -13,8 +71,15 @@ async def invest(
 ) -> None:
     """Distributes funds between projects and donations,
     closing them when fully funded.
+
+    The endpoints allocate through ``allocate``; this loop over the
+    objects returned by ``CRUDBase.get_active_objs`` is kept as the
+    reference implementation the allocation modes are tested against.
     """
     close_date = datetime.now()
+    invested_before = obj_to_invest.invested_amount
+    was_open = not obj_to_invest.fully_invested
+    closed_projects = 0
 
     for investment in investments:
         amount_to_invest = (
@@ -24,20 +89,313 @@ async def invest(
         if amount_to_invest >= free_amount:
             investment.invested_amount += free_amount
             obj_to_invest.invested_amount += free_amount
-            investment.fully_invested = True
-            investment.close_date = close_date
+            investment.close(close_date)
+            closed_projects += isinstance(investment, CharityProject)
         else:
             investment.invested_amount += amount_to_invest
             obj_to_invest.invested_amount += amount_to_invest
-            obj_to_invest.fully_invested = True
-            obj_to_invest.close_date = close_date
+            obj_to_invest.close(close_date)
             break
 
         session.add(investment)
 
     if obj_to_invest.invested_amount >= obj_to_invest.full_amount:
-        obj_to_invest.fully_invested = True
-        obj_to_invest.close_date = close_date
+        obj_to_invest.close(close_date)
+    closed_projects += (
+        isinstance(obj_to_invest, CharityProject) and
+        was_open and obj_to_invest.fully_invested
+    )
     session.add(obj_to_invest)
+    await fund_stats_crud.add(
+        session,
+        total_invested=obj_to_invest.invested_amount - invested_before,
+        open_projects=-closed_projects,
+    )
     await session.commit()
     await session.refresh(obj_to_invest)
+    await expire_cached_views(
+        obj_to_invest, obj_to_invest.invested_amount - invested_before
+    )
+
+
+async def distribute_set_based(
+    model: Union[Type[CharityProject], Type[Donation]],
+    amount: int,
+    close_date: datetime,
+    session: AsyncSession,
+) -> tuple[int, int]:
+    """
+    Distribute ``amount`` over the open objects of ``model`` in FIFO
+    order with a single UPDATE and return the amount distributed
+    and the number of objects closed.
+
+    Running totals over the open rows are computed by a window function;
+    only the last row they reach can be left partially invested.
+    The UPDATE only applies if the number and the total version of the
+    rows it covers are still the ones the totals were computed from.
+    """
+    free_amount = model.full_amount - model.invested_amount
+    running = {"order_by": model.id}
+    ranked = (
+        select(
+            model.id.label("id"),
+            free_amount.label("free_amount"),
+            (
+                func.sum(free_amount).over(**running) - free_amount
+            ).label("invested_before"),
+            func.count().over(**running).label("rows_count"),
+            func.sum(model.version).over(**running).label("versions_sum"),
+        )
+        .where(model.fully_invested == false())
+        .subquery()
+    )
+    last_row = await session.execute(
+        select(ranked)
+        .where(ranked.c.invested_before < amount)
+        .order_by(ranked.c.id.desc())
+        .limit(1)
+    )
+    last_row = last_row.first()
+    if last_row is None:
+        return 0, 0
+
+    (
+        last_id, last_free_amount, invested_before, rows_count, versions_sum
+    ) = last_row
+    last_share = min(last_free_amount, amount - invested_before)
+    covered = aliased(model)
+    covered_rows = (
+        covered.fully_invested == false(),
+        covered.id <= last_id,
+    )
+    if session.get_bind().dialect.name != "sqlite":
+        await session.execute(
+            select(covered.id).where(*covered_rows).with_for_update()
+        )
+    stmt = update(model).where(
+        model.fully_invested == false(),
+        model.id <= last_id,
+        select(func.count())
+        .where(*covered_rows)
+        .scalar_subquery() == rows_count,
+        select(func.sum(covered.version))
+        .where(*covered_rows)
+        .scalar_subquery() == versions_sum,
+    )
+    closing = model.closing_values(close_date)
+    closed_count = rows_count
+    if last_share == last_free_amount:
+        stmt = stmt.values(**closing)
+    else:
+        closed_count -= 1
+        is_last = model.id == last_id
+        kept = {name: getattr(model, name) for name in closing}
+        kept["invested_amount"] = model.invested_amount + last_share
+        stmt = stmt.values(**{
+            name: case((is_last, kept[name]), else_=value)
+            for name, value in closing.items()
+        })
+    result = await session.execute(
+        stmt
+        .values(version=model.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != rows_count:
+        raise AllocationConflict(
+            f"{model.__name__} rows were changed concurrently."
+        )
+    return invested_before + last_share, closed_count
+
+
+async def _distribute(
+    obj_to_invest: Union[CharityProject, Donation],
+    session: AsyncSession,
+) -> None:
+    """Run a single allocation attempt without committing it."""
+    close_date = datetime.now()
+    model = OPPOSITE_MODELS[type(obj_to_invest)]
+    amount = obj_to_invest.full_amount - obj_to_invest.invested_amount
+    if settings.allocation_mode == SET_BASED_MODE:
+        invested, closed_count = await distribute_set_based(
+            model, amount, close_date, session
+        )
+    else:
+        ledger = FIFOLedger(model, session)
+        invested = await ledger.take(amount)
+        closed_count = await ledger.flush(close_date)
+    closed_projects = closed_count if model is CharityProject else 0
+
+    obj_to_invest.invested_amount += invested
+    if obj_to_invest.invested_amount >= obj_to_invest.full_amount:
+        closed_projects += (
+            isinstance(obj_to_invest, CharityProject) and
+            not obj_to_invest.fully_invested
+        )
+        obj_to_invest.close(close_date)
+    session.add(obj_to_invest)
+    await fund_stats_crud.add(
+        session, total_invested=invested, open_projects=-closed_projects
+    )
+
+
+async def _allocate_once(
+    obj_to_invest: Union[CharityProject, Donation],
+    session: AsyncSession,
+) -> None:
+    """Run a single allocation attempt and commit it."""
+    await _distribute(obj_to_invest, session)
+    await commit_loaded(obj_to_invest, session)
+
+
+async def run_with_retries(
+    attempt: Callable[[], Awaitable[ResultType]],
+    session: AsyncSession,
+    on_retry: Optional[Callable[[], Awaitable[None]]] = None,
+) -> ResultType:
+    """
+    Run an allocation attempt that commits its own work.
+
+    An attempt that lost a race with a concurrent allocation is rolled
+    back and retried with a randomised exponential backoff; any other
+    database error is re-raised right away.
+    """
+    for number in range(settings.allocation_retries + 1):
+        try:
+            return await attempt()
+        except CONFLICT_ERRORS as error:
+            await session.rollback()
+            if not is_retryable(error) or (
+                number == settings.allocation_retries
+            ):
+                raise
+        await asyncio.sleep(random.uniform(0, RETRY_DELAY * 2 ** number))
+        if on_retry is not None:
+            await on_retry()
+
+
+async def allocate(
+    obj_to_invest: Union[CharityProject, Donation],
+    session: AsyncSession,
+) -> None:
+    """
+    Distribute a new project or donation over the open objects
+    of the opposite model using the configured allocation mode.
+    """
+    invested_before = obj_to_invest.invested_amount
+    await run_with_retries(
+        partial(_allocate_once, obj_to_invest, session),
+        session,
+        on_retry=partial(session.refresh, obj_to_invest),
+    )
+    await expire_cached_views(
+        obj_to_invest, obj_to_invest.invested_amount - invested_before
+    )
+
+
+async def _create_and_allocate_once(
+    crud: CRUDBase,
+    data: BaseModel,
+    session: AsyncSession,
+    user: Optional[User],
+) -> Union[CharityProject, Donation]:
+    """Insert and allocate a new object and commit both at once."""
+    new_obj = await crud.create(data, session, user, commit=False)
+    await _distribute(new_obj, session)
+    await commit_loaded(new_obj, session)
+    return new_obj
+
+
+async def create_and_allocate(
+    crud: CRUDBase,
+    data: BaseModel,
+    session: AsyncSession,
+    user: Optional[User] = None,
+) -> Union[CharityProject, Donation]:
+    """
+    Create a project or donation and allocate it in a single
+    transaction with one commit and no refresh.
+
+    A retried attempt rolls the insert back together with
+    the allocation and starts over from the request data.
+    """
+    new_obj = await run_with_retries(
+        partial(_create_and_allocate_once, crud, data, session, user),
+        session,
+    )
+    await expire_cached_views(new_obj, new_obj.invested_amount)
+    return new_obj
+
+
+async def _allocate_open_objects_once(session: AsyncSession) -> int:
+    """
+    Match all open donations against all open projects, commit
+    and return the amount invested.
+    """
+    close_date = datetime.now()
+    donations = FIFOLedger(Donation, session)
+    projects = FIFOLedger(CharityProject, session)
+    total_invested = 0
+    while amount := await donations.head_remaining():
+        invested = await projects.take(amount)
+        if not invested:
+            break
+        await donations.take(invested)
+        total_invested += invested
+    closed_projects = await projects.flush(close_date)
+    await donations.flush(close_date)
+    await fund_stats_crud.add(
+        session,
+        total_invested=total_invested,
+        open_projects=-closed_projects,
+    )
+    await session.commit()
+    return total_invested
+
+
+async def fill_new_donations(
+    donations: list[dict], session: AsyncSession
+) -> None:
+    """
+    Allocate not yet inserted donations, given as column values, from
+    the open projects in the order of the list.
+
+    Each donation ends up exactly as if it had been created and
+    allocated on its own; older open donations are left alone.
+    The projects and the fund totals are written back, the donations
+    are left to the caller.
+    """
+    close_date = datetime.now()
+    projects = FIFOLedger(CharityProject, session)
+    for donation in donations:
+        invested = await projects.take(donation["full_amount"])
+        fully_invested = invested == donation["full_amount"]
+        donation.update(
+            invested_amount=invested,
+            fully_invested=fully_invested,
+            close_date=close_date if fully_invested else None,
+        )
+    closed_projects = await projects.flush(close_date)
+    await fund_stats_crud.add(
+        session,
+        total_raised=sum(donation["full_amount"] for donation in donations),
+        total_invested=sum(
+            donation["invested_amount"] for donation in donations
+        ),
+        open_projects=-closed_projects,
+    )
+
+
+async def allocate_open_objects(session: AsyncSession) -> None:
+    """
+    Distribute every open donation over the open projects in one pass.
+
+    Both sides are walked in FIFO order of their ids, so the invariant
+    left by ``allocate`` holds again after the pass: there are never open
+    donations and open projects at the same time.
+    """
+    invested = await run_with_retries(
+        partial(_allocate_open_objects_once, session), session
+    )
+    if invested:
+        donation_cache.invalidate_all()
+        await project_list_cache.invalidate()
@@ -0,0 +1,148 @@
+from collections import deque
+from datetime import datetime
+from typing import Optional, Type, Union
+
+from sqlalchemy import false, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CharityProject, Donation
+
+CHUNK_SIZE = 100
+
+LedgerModel = Union[Type[CharityProject], Type[Donation]]
+
+
+class AllocationConflict(Exception):
+    """Rows changed between being read and being allocated."""
+
+
+class FIFOLedger:
+    """FIFO queue of open ``(id, remaining_amount)`` pairs of one model.
+
+    Open rows are read lazily, one chunk at a time and only while the
+    queue cannot cover the requested amount, so the cost of an allocation
+    depends on the number of rows it touches rather than on the size of
+    the backlog. The ledger lives for a single allocation run and never
+    outlives the transaction it reads from.
+
+    Rows are claimed with a blocking ``FOR UPDATE`` where the backend
+    supports it, so concurrent allocations still fill rows strictly in
+    id order, and every write is guarded by the row version, so a row
+    changed by a concurrent allocation raises ``AllocationConflict``
+    instead of being filled twice.
+    """
+
+    def __init__(
+        self,
+        model: LedgerModel,
+        session: AsyncSession,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        self.model = model
+        self.session = session
+        self.chunk_size = chunk_size
+        self._queue: deque[list[int]] = deque()
+        self._last_id = 0
+        self._exhausted = False
+        self._closed: list[tuple[int, int]] = []
+        self._partial: Optional[list[int]] = None
+
+    async def _load_chunk(self) -> None:
+        """Append the next chunk of open rows to the queue."""
+        rows = await self.session.execute(
+            select(
+                self.model.id,
+                self.model.full_amount - self.model.invested_amount,
+                self.model.version,
+            )
+            .where(
+                self.model.fully_invested == false(),
+                self.model.id > self._last_id
+            )
+            .order_by(self.model.id)
+            .limit(self.chunk_size)
+            .with_for_update()
+        )
+        rows = rows.all()
+        if len(rows) < self.chunk_size:
+            self._exhausted = True
+        if rows:
+            self._last_id = rows[-1][0]
+        self._queue.extend(list(row) for row in rows)
+
+    async def head_remaining(self) -> int:
+        """Return the amount still open on the head of the queue."""
+        if not self._queue and not self._exhausted:
+            await self._load_chunk()
+        return self._queue[0][1] if self._queue else 0
+
+    async def take(self, amount: int) -> int:
+        """
+        Withdraw up to ``amount`` from the head of the queue
+        and return the amount actually withdrawn.
+        """
+        taken = 0
+        while taken < amount:
+            if not self._queue:
+                if self._exhausted:
+                    break
+                await self._load_chunk()
+                continue
+            head = self._queue[0]
+            obj_id, remaining, version = head
+            portion = min(remaining, amount - taken)
+            taken += portion
+            if portion == remaining:
+                self._queue.popleft()
+                self._closed.append((obj_id, version))
+                if self._partial is not None and self._partial[0] == obj_id:
+                    self._partial = None
+                continue
+            head[1] -= portion
+            if self._partial is None or self._partial[0] != obj_id:
+                self._partial = [obj_id, version, 0]
+            self._partial[2] += portion
+        return taken
+
+    async def _execute_versioned(self, stmt, expected_rows: int) -> None:
+        """Execute a version-guarded UPDATE and check that it matched."""
+        result = await self.session.execute(
+            stmt
+            .values(version=self.model.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != expected_rows:
+            raise AllocationConflict(
+                f"{self.model.__name__} rows were changed concurrently."
+            )
+
+    async def flush(self, close_date: datetime) -> int:
+        """
+        Write the withdrawn amounts back to the database
+        and return the number of rows closed.
+        """
+        closed_count = len(self._closed)
+        for start in range(0, len(self._closed), self.chunk_size):
+            chunk = self._closed[start:start + self.chunk_size]
+            await self._execute_versioned(
+                update(self.model)
+                .where(tuple_(self.model.id, self.model.version).in_(chunk))
+                .values(**self.model.closing_values(close_date)),
+                len(chunk)
+            )
+        if self._partial is not None:
+            obj_id, version, portion = self._partial
+            await self._execute_versioned(
+                update(self.model)
+                .where(
+                    self.model.id == obj_id,
+                    self.model.version == version
+                )
+                .values(
+                    invested_amount=self.model.invested_amount + portion
+                ),
+                1
+            )
+        self._closed = []
+        self._partial = None
+        return closed_count
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+from uuid import uuid4
+
+from aiogoogle import Aiogoogle
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import AsyncSessionLocal
+from app.core.google_client import google_client
+from app.crud import charity_project_crud
+from app.schemas import ReportJob
+from app.services.google_api import SPREADSHEET_URL, generate_report
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS = 100
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ReportJobManager:
+    """
+    Generate reports on background tasks.
+
+    A request for a report while an identical one is still being
+    generated joins that job instead of starting another. The last
+    ``max_jobs`` jobs are kept for status requests.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        service_factory: Callable[
+            [], Awaitable[Aiogoogle]
+        ] = google_client.start,
+        max_jobs: int = MAX_JOBS,
+    ):
+        self.session_factory = session_factory
+        self.service_factory = service_factory
+        self.max_jobs = max_jobs
+        self.jobs: OrderedDict[str, ReportJob] = OrderedDict()
+        self._active: dict[tuple, ReportJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, **params) -> ReportJob:
+        """Start a report job or return the running identical one."""
+        key = tuple(sorted(params.items()))
+        job = self._active.get(key)
+        if job is not None:
+            return job
+        job = ReportJob(
+            id=uuid4().hex, status=PENDING, created_date=datetime.now()
+        )
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        self._active[key] = job
+        task = asyncio.create_task(self._run(job, key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        """Return a job by its id."""
+        return self.jobs.get(job_id)
+
+    async def _run(self, job: ReportJob, key: tuple) -> None:
+        job.status = RUNNING
+
+        def on_progress(written_rows: int, total_rows: int) -> None:
+            job.written_rows = written_rows
+            job.total_rows = total_rows
+
+        try:
+            async with self.session_factory() as session:
+                projects = await (
+                    charity_project_crud.get_projects_by_completion_rate(
+                        session, **dict(key)
+                    )
+                )
+                spreadsheet_id = await generate_report(
+                    projects,
+                    session,
+                    await self.service_factory(),
+                    on_progress
+                )
+        except Exception as error:
+            logger.exception("Report job %s failed.", job.id)
+            job.status = FAILED
+            job.error = str(error)
+        else:
+            job.status = DONE
+            job.spreadsheet_url = SPREADSHEET_URL.format(
+                spreadsheet_id=spreadsheet_id
+            )
+        finally:
+            job.finished_date = datetime.now()
+            del self._active[key]
+
+    async def stop(self) -> None:
+        """Cancel the running jobs."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+report_jobs = ReportJobManager()
@@ -0,0 +1,116 @@
+"""
+Measure the throughput of concurrent ``POST /donation/`` requests against
+a file SQLite database with SQLAlchemy's default engine and with the
+engine built from the pool and pragma settings.
+
+The requests are sent straight to the ASGI application, so the numbers
+include routing, validation, the insert and the allocation, but no
+network.
+
+Usage:
+    python -m benchmarks.donation_throughput --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.asgi import send_request
+
+from app.core.base import Base
+from app.core.db import create_db_engine, get_async_session
+from app.core.user import current_user
+from app.main import app
+from app.models import CharityProject, User
+
+PROJECTS = 100
+PROJECT_AMOUNT = 10_000
+DONATION_AMOUNT = 150
+DONATION_URL = "/donation/"
+
+
+def prepare_database(path: Path) -> None:
+    """Create the tables and the open projects the donations fill."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        connection.execute(User.__table__.insert(), [{
+            "id": 1,
+            "email": "donor@example.com",
+            "hashed_password": "",
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+        }])
+        connection.execute(CharityProject.__table__.insert(), [
+            {
+                "name": f"Project {number}",
+                "description": "Benchmark project",
+                "full_amount": PROJECT_AMOUNT,
+                "invested_amount": 0,
+                "fully_invested": False,
+                "version": 1,
+            }
+            for number in range(PROJECTS)
+        ])
+    engine.dispose()
+
+
+async def run(engine, requests: int, concurrency: int) -> tuple:
+    """Send the requests through sessions of ``engine``."""
+    session_factory = sessionmaker(engine, class_=AsyncSession)
+
+    async def override_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override_session
+    app.dependency_overrides[current_user] = lambda: User(id=1)
+    semaphore = asyncio.Semaphore(concurrency)
+    body = json.dumps({"full_amount": DONATION_AMOUNT}).encode()
+
+    async def limited() -> int:
+        async with semaphore:
+            return await send_request(app, "POST", DONATION_URL, body)
+
+    started = time.perf_counter()
+    statuses = await asyncio.gather(*(limited() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    app.dependency_overrides = {}
+    return elapsed, Counter(statuses)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    engines = {
+        "default engine": lambda url: create_async_engine(url),
+        "tuned engine": create_db_engine,
+    }
+    for label, make_engine in engines.items():
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "bench.db"
+            prepare_database(path)
+            elapsed, statuses = asyncio.run(run(
+                make_engine(f"sqlite+aiosqlite:///{path}"),
+                args.requests,
+                args.concurrency,
+            ))
+        print(
+            f"{label}: {args.requests / elapsed:.0f} requests/s, "
+            f"statuses {dict(statuses)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
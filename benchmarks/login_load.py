@@ -0,0 +1,155 @@
+"""
+Measure the latency of ``POST /donation/`` while concurrent
+``POST /auth/jwt/login`` requests keep bcrypt busy, once with passwords
+hashed inline on the event loop and once on the password hashing pool.
+
+Usage:
+    python -m benchmarks.login_load --donations 40 --logins 4
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.asgi import send_request
+
+import app.core.user as user_module
+from app.core.base import Base
+from app.core.config import settings
+from app.core.db import create_db_engine, get_async_session
+from app.core.passwords import PooledPasswordHelper
+from app.main import app
+from app.models import CharityProject, User
+
+EMAIL = "donor@example.com"
+PASSWORD = "benchmark-password"
+PROJECT_AMOUNT = 10 ** 9
+DONATION_AMOUNT = 150
+DONATION_URL = "/donation/"
+LOGIN_URL = "/auth/jwt/login"
+
+
+def prepare_database(path: Path, hashed_password: str) -> None:
+    """Create the tables, the donor and one open project."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        connection.execute(User.__table__.insert(), [{
+            "id": 1,
+            "email": EMAIL,
+            "hashed_password": hashed_password,
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+        }])
+        connection.execute(CharityProject.__table__.insert(), [{
+            "name": "Project",
+            "description": "Benchmark project",
+            "full_amount": PROJECT_AMOUNT,
+            "invested_amount": 0,
+            "fully_invested": False,
+            "version": 1,
+        }])
+    engine.dispose()
+
+
+async def run(
+    engine, helper: PooledPasswordHelper, donations: int, logins: int
+) -> tuple[list[float], int]:
+    """
+    Send ``donations`` donations one after another while ``logins``
+    clients log in back to back, and return the donation latencies
+    and the number of completed logins.
+    """
+    session_factory = sessionmaker(engine, class_=AsyncSession)
+
+    async def override_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override_session
+    app.dependency_overrides[user_module.current_user] = lambda: User(id=1)
+    user_module.password_helper = helper
+    login_body = urlencode(
+        {"username": EMAIL, "password": PASSWORD}
+    ).encode()
+    donation_body = json.dumps({"full_amount": DONATION_AMOUNT}).encode()
+    stop = asyncio.Event()
+    completed_logins = 0
+
+    async def login_loop() -> None:
+        nonlocal completed_logins
+        while not stop.is_set():
+            await send_request(
+                app, "POST", LOGIN_URL, login_body,
+                "application/x-www-form-urlencoded",
+            )
+            completed_logins += 1
+
+    login_tasks = [asyncio.create_task(login_loop()) for _ in range(logins)]
+    latencies = []
+    for _ in range(donations):
+        started = time.perf_counter()
+        await send_request(app, "POST", DONATION_URL, donation_body)
+        latencies.append(time.perf_counter() - started)
+    stop.set()
+    await asyncio.gather(*login_tasks)
+    helper.shutdown()
+    await engine.dispose()
+    app.dependency_overrides = {}
+    return latencies, completed_logins
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return sorted(values)[int(fraction * (len(values) - 1))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--donations", type=int, default=40)
+    parser.add_argument("--logins", type=int, default=4)
+    parser.add_argument(
+        "--rounds", type=int, default=settings.password_hash_rounds
+    )
+    parser.add_argument(
+        "--workers", type=int, default=settings.password_hash_workers
+    )
+    args = parser.parse_args()
+    original_helper = user_module.password_helper
+    helpers = {
+        "no logins": (PooledPasswordHelper(args.rounds, args.workers), 0),
+        "inline hashing": (PooledPasswordHelper(args.rounds, 0), args.logins),
+        "pooled hashing": (
+            PooledPasswordHelper(args.rounds, args.workers), args.logins
+        ),
+    }
+    for label, (helper, logins) in helpers.items():
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "bench.db"
+            prepare_database(path, helper.hash(PASSWORD))
+            latencies, completed_logins = asyncio.run(run(
+                create_db_engine(f"sqlite+aiosqlite:///{path}"),
+                helper,
+                args.donations,
+                logins,
+            ))
+        elapsed = sum(latencies)
+        print(
+            f"{label}: donation p50 "
+            f"{statistics.median(latencies) * 1000:.1f} ms, "
+            f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+            f"{completed_logins / elapsed:.1f} logins/s"
+        )
+    user_module.password_helper = original_helper
+
+
+if __name__ == "__main__":
+    main()
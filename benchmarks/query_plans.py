@@ -0,0 +1,142 @@
+"""
+Compare the query plans and timings of the open-row scans, the closed
+project report and the per-user donation lookup with and without the
+indexes declared on the models.
+
+Usage:
+    python -m benchmarks.query_plans --rows 1000000
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, false, func, select, text, true
+
+from app.core.base import Base
+from app.models import CharityProject, Donation
+
+OPEN_SHARE = 0.01
+USERS = 1000
+PROJECTS_SHARE = 0.01
+CHUNK_SIZE = 100
+
+
+def queries() -> dict:
+    """Return the statements the application runs on hot paths."""
+    return {
+        "open donations chunk": (
+            select(
+                Donation.id,
+                Donation.full_amount - Donation.invested_amount,
+                Donation.version,
+            )
+            .where(Donation.fully_invested == false(), Donation.id > 0)
+            .order_by(Donation.id)
+            .limit(CHUNK_SIZE)
+        ),
+        "open projects chunk": (
+            select(
+                CharityProject.id,
+                CharityProject.full_amount - CharityProject.invested_amount,
+                CharityProject.version,
+            )
+            .where(
+                CharityProject.fully_invested == false(),
+                CharityProject.id > 0
+            )
+            .order_by(CharityProject.id)
+            .limit(CHUNK_SIZE)
+        ),
+        "closed projects report": (
+            select(CharityProject)
+            .where(CharityProject.fully_invested == true())
+            .order_by(
+                func.julianday(CharityProject.close_date) -
+                func.julianday(CharityProject.create_date)
+            )
+        ),
+        "user donations": (
+            select(Donation).where(Donation.user_id == USERS // 2)
+        ),
+    }
+
+
+def fill(connection, rows: int) -> None:
+    """Insert ``rows`` donations and a proportional number of projects."""
+    start = datetime(2024, 1, 1)
+    for model, count in (
+        (Donation, rows),
+        (CharityProject, max(int(rows * PROJECTS_SHARE), 1)),
+    ):
+        values = []
+        for obj_id in range(1, count + 1):
+            is_open = random.random() < OPEN_SHARE
+            create_date = start + timedelta(minutes=obj_id)
+            row = {
+                "id": obj_id,
+                "full_amount": 1000,
+                "invested_amount": 0 if is_open else 1000,
+                "fully_invested": not is_open,
+                "create_date": create_date,
+                "close_date": None if is_open else create_date + timedelta(
+                    hours=random.randint(1, 1000)
+                ),
+                "version": 1,
+            }
+            if model is Donation:
+                row["user_id"] = random.randint(1, USERS)
+            else:
+                row["name"] = f"Project {obj_id}"
+                row["description"] = "Benchmark project"
+            values.append(row)
+        connection.execute(model.__table__.insert(), values)
+
+
+def measure(connection, label: str) -> None:
+    """Print the plan and the run time of every hot query."""
+    print(f"\n=== {label} ===")
+    for name, stmt in queries().items():
+        compiled = stmt.compile(
+            connection, compile_kwargs={"literal_binds": True}
+        )
+        plan = connection.execute(
+            text(f"EXPLAIN QUERY PLAN {compiled}")
+        ).all()
+        started = time.perf_counter()
+        connection.execute(stmt).all()
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {elapsed * 1000:.1f} ms")
+        for row in plan:
+            print(f"    {row[-1]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{Path(directory) / 'bench.db'}")
+        tables = [CharityProject.__table__, Donation.__table__]
+        indexes = [index for table in tables for index in table.indexes]
+        with engine.begin() as connection:
+            Base.metadata.create_all(connection)
+            for index in indexes:
+                index.drop(connection)
+            fill(connection, args.rows)
+            connection.execute(text("ANALYZE"))
+        with engine.connect() as connection:
+            measure(connection, "without indexes")
+        with engine.begin() as connection:
+            for index in indexes:
+                index.create(connection)
+            connection.execute(text("ANALYZE"))
+        with engine.connect() as connection:
+            measure(connection, "with indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -43,6 +43,10 @@ except (NameError, ImportError) as error:
     )
 
 
+from app.core.donation_cache import donation_cache  # noqa
+from app.core.response_cache import project_list_cache  # noqa
+
+
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
 
 pytest_plugins = [
@@ -70,6 +74,8 @@ async def override_db():
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await project_list_cache.invalidate()
+    donation_cache.invalidate_all()
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -1,3 +1,14 @@
+import asyncio
+import threading
+
+from conftest import TestingSessionLocal, app, current_user
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+
+from app.core.passwords import password_helper
+from app.core.user import UserManager
+from app.models import User
+from app.schemas.user import UserUpdate
+
 REGISTER_URL = '/auth/register'
 
 
@@ -49,3 +60,60 @@ def test_register_invalid_pass(user_client):
         'Убедитесь, что в ответе на некорректный POST-запрос '
         f'к эндпоинту `{REGISTER_URL}` есть ключ `detail`.'
     )
+
+
+def test_authenticated_user_is_cached_until_updated(test_client, monkeypatch):
+    credentials = {'email': 'cached@pool.com', 'password': 'chimichangas'}
+    user_id = test_client.post(REGISTER_URL, json=credentials).json()['id']
+    token = test_client.post('/auth/jwt/login', data={
+        'username': credentials['email'],
+        'password': credentials['password'],
+    }).json()['access_token']
+    app.dependency_overrides.pop(current_user)
+    headers = {'Authorization': f'Bearer {token}'}
+    assert test_client.get('/users/me', headers=headers).status_code == 200, (
+        'Запрос с действующим токеном должен проходить аутентификацию.'
+    )
+
+    async def forbidden_get(*args, **kwargs):
+        raise AssertionError('user table queried')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(SQLAlchemyUserDatabase, 'get', forbidden_get)
+        response = test_client.get('/users/me', headers=headers)
+    assert response.status_code == 200, (
+        'Пользователь недавно проверенного токена должен браться из кэша '
+        'без запроса к таблице пользователей.'
+    )
+
+    async def deactivate():
+        async with TestingSessionLocal() as session:
+            manager = UserManager(SQLAlchemyUserDatabase(session, User))
+            user = await manager.get(user_id)
+            await manager.update(UserUpdate(is_active=False), user)
+
+    asyncio.run(deactivate())
+    assert test_client.get('/users/me', headers=headers).status_code == 401, (
+        'После деактивации пользователя кэш его токенов должен '
+        'сбрасываться.'
+    )
+
+
+async def test_password_hashing_runs_off_the_event_loop(monkeypatch):
+    threads = []
+    original_hash = password_helper.hash
+
+    def recording_hash(password):
+        threads.append(threading.current_thread().name)
+        return original_hash(password)
+
+    monkeypatch.setattr(password_helper, 'hash', recording_hash)
+    hashed_password = await password_helper.hash_async('chimichangas')
+    verified, _ = await password_helper.verify_and_update_async(
+        'chimichangas', hashed_password
+    )
+    assert verified, 'Хэш пароля должен проходить проверку.'
+    assert threads and threads[0].startswith('password'), (
+        'Хэширование паролей должно выполняться в пуле потоков, '
+        'а не в потоке цикла событий.'
+    )
@@ -2,6 +2,12 @@ import time
 from datetime import datetime
 
 import pytest
+from conftest import TEST_DB, app, current_user
+from fixtures.user import superuser
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import charity_project_crud
 
 PROJECTS_URL = '/charity_project/'
 PROJECT_DETAILS_URL = PROJECTS_URL + '{project_id}'
@@ -728,3 +734,146 @@ def test_get_all_charity_project_not_auth_user(test_client):
         f'пользователя к эндпоинту `{PROJECTS_URL}` возвращается список '
         'существующих проектов.'
     )
+
+
+@pytest.mark.parametrize('method, json_data', [
+    ('patch', {'full_amount': 2000000}),
+    ('delete', None),
+])
+def test_charity_project_changed_concurrently(
+        superuser_client, charity_project, monkeypatch, method, json_data
+):
+    from app.api.endpoints import charity_project as endpoints
+
+    def bump_version():
+        with create_engine(f'sqlite:///{TEST_DB}').begin() as connection:
+            connection.execute(
+                text('UPDATE charityproject SET version = version + 1')
+            )
+
+    for crud_method in ('update', 'delete'):
+        original = getattr(endpoints.charity_project_crud, crud_method)
+
+        async def racing_method(*args, original=original, **kwargs):
+            bump_version()
+            return await original(*args, **kwargs)
+
+        monkeypatch.setattr(
+            endpoints.charity_project_crud, crud_method, racing_method
+        )
+    response = superuser_client.request(
+        method,
+        PROJECT_DETAILS_URL.format(project_id=charity_project.id),
+        json=json_data
+    )
+    assert response.status_code == 409, (
+        'Если проект был изменён параллельным запросом, '
+        f'{method.upper()}-запрос к эндпоинту `{PROJECT_DETAILS_URL}` '
+        'должен вернуть статус-код 409.'
+    )
+
+
+def test_update_charity_project_without_reading_it_back(
+        superuser_client, charity_project, monkeypatch
+):
+    refreshed = []
+    original_refresh = AsyncSession.refresh
+
+    async def counted_refresh(self, *args, **kwargs):
+        refreshed.append(args[0])
+        await original_refresh(self, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncSession, 'refresh', counted_refresh)
+    response = superuser_client.patch(
+        PROJECT_DETAILS_URL.format(project_id=charity_project.id),
+        json={'name': 'renamed project', 'full_amount': 2000000}
+    )
+    assert response.status_code == 200, (
+        'Корректный PATCH-запрос суперпользователя к эндпоинту '
+        f'`{PROJECT_DETAILS_URL}` должен вернуть статус-код 200.'
+    )
+    assert not refreshed, (
+        'Обновлённый проект не должен повторно считываться из базы данных.'
+    )
+    assert (
+        response.json()['name'], response.json()['full_amount']
+    ) == ('renamed project', 2000000), (
+        'Ответ на PATCH-запрос должен содержать новые значения полей.'
+    )
+    with create_engine(f'sqlite:///{TEST_DB}').connect() as connection:
+        row = connection.execute(text(
+            'SELECT name, full_amount FROM charityproject'
+        )).one()
+    assert tuple(row) == ('renamed project', 2000000), (
+        'Изменения проекта должны быть сохранены в базе данных.'
+    )
+
+
+def test_get_all_charity_project_by_pages(test_client, mixer):
+    for number in range(5):
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'project {number}',
+            description='Paged project',
+            full_amount=1000,
+        )
+    pages = []
+    params = {'limit': 2}
+    while True:
+        response = test_client.get(PROJECTS_URL, params=params)
+        assert response.status_code == 200, (
+            f'GET-запрос к эндпоинту `{PROJECTS_URL}` с курсором страницы '
+            'должен вернуть ответ со статус-кодом 200.'
+        )
+        pages.append([project['id'] for project in response.json()])
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+        params = {'limit': 2, 'cursor': cursor}
+    assert pages == [[1, 2], [3, 4], [5]], (
+        f'Эндпоинт `{PROJECTS_URL}` должен отдавать проекты страницами '
+        'по возрастанию id, передавая курсор следующей страницы '
+        'в заголовке `X-Next-Cursor`.'
+    )
+    response = test_client.get(PROJECTS_URL, params={'cursor': 'not a cursor'})
+    assert response.status_code == 400, (
+        'Некорректный курсор страницы должен приводить к ответу '
+        'со статус-кодом 400.'
+    )
+
+
+def test_project_list_is_cached_until_projects_change(
+        superuser_client, monkeypatch
+):
+    superuser_client.post(PROJECTS_URL, json={
+        'name': 'cached project', 'description': 'description',
+        'full_amount': 100,
+    })
+    first_body = superuser_client.get(PROJECTS_URL).content
+
+    async def forbidden_query(*args, **kwargs):
+        raise AssertionError('database queried')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(charity_project_crud, 'get_multi', forbidden_query)
+        response = superuser_client.get(PROJECTS_URL)
+    assert response.content == first_body, (
+        f'Повторный GET-запрос к эндпоинту `{PROJECTS_URL}` должен '
+        'отдаваться из кэша без обращения к базе данных.'
+    )
+    app.dependency_overrides[current_user] = lambda: superuser
+    superuser_client.post('/donation/', json={'full_amount': 40})
+    assert superuser_client.get(PROJECTS_URL).json()[0][
+        'invested_amount'
+    ] == 40, (
+        'Распределение пожертвования должно сбрасывать кэш списка проектов.'
+    )
+    superuser_client.post(PROJECTS_URL, json={
+        'name': 'another project', 'description': 'description',
+        'full_amount': 100,
+    })
+    assert [
+        project['name'] for project in superuser_client.get(PROJECTS_URL).json()
+    ] == ['cached project', 'another project'], (
+        'Создание проекта должно сбрасывать кэш списка проектов.'
+    )
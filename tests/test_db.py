@@ -1,4 +1,6 @@
-from conftest import BASE_DIR
+from sqlalchemy import false, select, text
+
+from conftest import BASE_DIR, engine
 
 
 try:
@@ -38,3 +40,47 @@ def test_check_db_url():
                 'Укажите значение по умолчанию для подключения базы данных '
                 'sqlite '
             )
+
+
+async def test_open_rows_scan_uses_partial_index():
+    from app.models import Donation
+
+    stmt = (
+        select(Donation.id, Donation.full_amount, Donation.version)
+        .where(Donation.fully_invested == false(), Donation.id > 0)
+        .order_by(Donation.id)
+    )
+    async with engine.connect() as connection:
+        compiled = stmt.compile(
+            connection.sync_connection,
+            compile_kwargs={'literal_binds': True}
+        )
+        plan = await connection.execute(
+            text(f'EXPLAIN QUERY PLAN {compiled}')
+        )
+        plan = ' '.join(row[-1] for row in plan.all())
+    assert 'ix_donation_open' in plan, (
+        'Выборка открытых пожертвований должна использовать '
+        f'частичный индекс `ix_donation_open`, план запроса: {plan}'
+    )
+
+
+async def test_sqlite_engine_applies_pragmas_and_pools(tmp_path):
+    from app.core.db import create_db_engine
+
+    db_engine = create_db_engine(
+        f'sqlite+aiosqlite:///{tmp_path / "pragmas.db"}'
+    )
+    async with db_engine.connect() as connection:
+        journal_mode = await connection.scalar(text('PRAGMA journal_mode'))
+        synchronous = await connection.scalar(text('PRAGMA synchronous'))
+        busy_timeout = await connection.scalar(text('PRAGMA busy_timeout'))
+    pool_status = db_engine.pool.status()
+    await db_engine.dispose()
+    assert (journal_mode, synchronous, busy_timeout) == ('wal', 1, 5000), (
+        'Движок SQLite должен включать WAL, synchronous=NORMAL '
+        'и busy_timeout при подключении.'
+    )
+    assert 'Pool size: 5' in pool_status, (
+        'Подключения к файлу SQLite должны переиспользоваться из пула.'
+    )
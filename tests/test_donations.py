@@ -1,11 +1,18 @@
+import csv
+import io
+import json
 import time
 from datetime import datetime
 
 import pytest
 
+from app.crud import donation_crud
+
 DONATIONS_URL = '/donation/'
 DONATON_DETAILS_URL = DONATIONS_URL + '{donation_id}'
 MY_DONATIONS_URL = DONATIONS_URL + 'my'
+MY_SUMMARY_URL = MY_DONATIONS_URL + '/summary'
+EXPORT_URL = DONATIONS_URL + 'export'
 
 
 @pytest.mark.parametrize('json_data, expected_keys, expected_data', [
@@ -97,6 +104,61 @@ def test_get_user_donation(user_client, donation):
     )
 
 
+def test_unchanged_user_donations_are_not_modified(
+        user_client, donation, monkeypatch
+):
+    response = user_client.get(MY_DONATIONS_URL)
+    etag = response.headers.get('etag')
+    assert etag, (
+        f'Ответ на GET-запрос к эндпоинту `{MY_DONATIONS_URL}` '
+        'должен содержать заголовок ETag.'
+    )
+
+    async def forbidden_query(*args, **kwargs):
+        raise AssertionError('database queried')
+
+    monkeypatch.setattr(donation_crud, 'get_user_donations', forbidden_query)
+    response = user_client.get(
+        MY_DONATIONS_URL, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 304, (
+        'Запрос с ETag неизменившегося списка пожертвований должен '
+        'получать ответ 304 без обращения к базе данных.'
+    )
+
+
+def test_user_donation_summary_is_revalidated(user_client, donation):
+    response = user_client.get(MY_SUMMARY_URL)
+    assert response.status_code == 200, (
+        f'GET-запрос к эндпоинту `{MY_SUMMARY_URL}` должен вернуть '
+        'ответ со статус-кодом 200.'
+    )
+    summary = response.json()
+    assert (
+        summary['count'], summary['total_amount'], summary['invested_amount']
+    ) == (1, 100, 0), 'Сводка пожертвований пользователя посчитана неверно.'
+    assert [item['id'] for item in summary['last_donations']] == [
+        donation.id
+    ], 'Сводка должна содержать последние пожертвования пользователя.'
+    etag = response.headers['etag']
+    response = user_client.get(MY_SUMMARY_URL, headers={'If-None-Match': etag})
+    assert response.status_code == 304, (
+        'Запрос с актуальным ETag сводки должен получать ответ 304.'
+    )
+    user_client.post(DONATIONS_URL, json={'full_amount': 50})
+    response = user_client.get(MY_SUMMARY_URL, headers={'If-None-Match': etag})
+    assert response.status_code == 200, (
+        'После нового пожертвования сводка пользователя должна '
+        'обновляться.'
+    )
+    assert response.json()['count'] == 2, (
+        'Обновлённая сводка должна учитывать новое пожертвование.'
+    )
+    assert response.json()['last_donations'][0]['full_amount'] == 50, (
+        'Последние пожертвования должны идти от новых к старым.'
+    )
+
+
 def test_get_all_donations(superuser_client, donation, another_donation):
     response = superuser_client.get(DONATIONS_URL)
     assert response.status_code == 200, (
@@ -221,3 +283,37 @@ def test_create_donation_check_create_date(user_client):
         'Убедитесь, что при неодновременном создании двух пожертвований '
         'у них отличаются значения в поле `create_date`.'
     )
+
+
+def test_export_donations(superuser_client, donation, another_donation):
+    response = superuser_client.get(EXPORT_URL)
+    assert response.status_code == 200, (
+        f'GET-запрос суперпользователя к эндпоинту `{EXPORT_URL}` должен '
+        'вернуть ответ со статус-кодом 200.'
+    )
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    listed = superuser_client.get(DONATIONS_URL).json()
+    assert [
+        {key: value for key, value in row.items() if value is not None}
+        for row in exported
+    ] == listed, (
+        f'Выгрузка NDJSON эндпоинта `{EXPORT_URL}` должна содержать '
+        f'те же пожертвования и поля, что и список `{DONATIONS_URL}`.'
+    )
+    response = superuser_client.get(
+        EXPORT_URL,
+        params={'format': 'csv', 'created_from': '2012-01-01T00:00:00'}
+    )
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row['id']) for row in rows] == [another_donation.id], (
+        f'Выгрузка CSV эндпоинта `{EXPORT_URL}` должна учитывать '
+        'фильтр по дате создания.'
+    )
+
+
+def test_export_donations_usual_user(user_client):
+    response = user_client.get(EXPORT_URL)
+    assert response.status_code == 403, (
+        f'GET-запрос обычного пользователя к эндпоинту `{EXPORT_URL}` '
+        'должен вернуть ответ со статус-кодом 403.'
+    )
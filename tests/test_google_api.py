@@ -0,0 +1,377 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from aiogoogle.excs import HTTPError
+from aiogoogle.resource import GoogleAPI
+from conftest import TestingSessionLocal, app
+
+from app.core.config import settings
+from app.core.google_client import (
+    CachedTokenManager, DiscoveryCache, get_service, google_client
+)
+from app.services import google_api
+from app.services.report_jobs import ReportJobManager, report_jobs
+
+REPORT_URL = '/google/'
+
+
+class FakeResource:
+    """Records the Google API method called through attribute access."""
+
+    def __init__(self, path=()):
+        self.path = path
+
+    def __getattr__(self, name):
+        return FakeResource((*self.path, name))
+
+    def __call__(self, **kwargs):
+        return '.'.join(self.path), kwargs
+
+
+class FakeResponse:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeAiogoogle:
+    """Stand-in for an Aiogoogle client recording the requests sent."""
+
+    def __init__(self):
+        self.requests = []
+        self.failures = {}
+
+    async def discover(self, api_name, api_version):
+        return FakeResource()
+
+    async def as_service_account(self, request):
+        self.requests.append(request)
+        status = self.failures.pop(len(self.requests), None)
+        if status is not None:
+            raise HTTPError('Request failed', res=FakeResponse(status))
+        if request[0] == 'spreadsheets.create':
+            return {'spreadsheetId': 'report-sheet'}
+        return {}
+
+
+@pytest.fixture
+def fake_google(superuser_client):
+    fake = FakeAiogoogle()
+    app.dependency_overrides[get_service] = lambda: fake
+    return fake
+
+
+def test_persistent_report_sends_only_changed_rows(
+        superuser_client, fake_google, small_fully_charity_project,
+        freezer, monkeypatch
+):
+    monkeypatch.setattr(settings, 'persistent_report', True)
+    monkeypatch.setattr(settings, 'email', 'owner@example.com')
+    response = superuser_client.get(REPORT_URL)
+    assert response.status_code == 200, (
+        f'GET-запрос суперпользователя к эндпоинту `{REPORT_URL}` '
+        'должен вернуть ответ со статус-кодом 200.'
+    )
+    assert [name for name, _ in fake_google.requests] == [
+        'spreadsheets.create',
+        'permissions.create',
+        'spreadsheets.values.batchUpdate',
+    ], (
+        'При первом формировании постоянного отчёта таблица должна '
+        'создаваться, открываться владельцу и заполняться.'
+    )
+    fake_google.requests.clear()
+    freezer.move_to('2010-10-12')
+    superuser_client.get(REPORT_URL)
+    assert len(fake_google.requests) == 1, (
+        'Повторное формирование постоянного отчёта должно обходиться '
+        'одним запросом к Google API.'
+    )
+    name, kwargs = fake_google.requests[0]
+    assert kwargs['spreadsheetId'] == 'report-sheet', (
+        'Повторный отчёт должен обновлять уже созданную таблицу.'
+    )
+    assert [item['range'] for item in kwargs['json']['data']] == [
+        'R1C1:R1C3'
+    ], (
+        'Повторный отчёт должен отправлять только изменившиеся строки.'
+    )
+
+
+class DiscoveringAiogoogle:
+    """Stand-in for an Aiogoogle client counting discovery requests."""
+
+    def __init__(self, fail=False):
+        self.discoveries = 0
+        self.fail = fail
+
+    async def discover(self, api_name, api_version):
+        self.discoveries += 1
+        if self.fail:
+            raise ConnectionError('Discovery service is unavailable')
+        return GoogleAPI({'name': api_name, 'version': api_version})
+
+
+async def test_discovery_cache_reuses_documents(tmp_path):
+    client = DiscoveringAiogoogle()
+    cache = DiscoveryCache(ttl=60, cache_dir=tmp_path)
+    await cache.discover(client, 'sheets', 'v4')
+    await cache.discover(client, 'sheets', 'v4')
+    assert client.discoveries == 1, (
+        'Документ обнаружения должен запрашиваться не чаще одного раза '
+        'за время жизни кэша.'
+    )
+    restarted_client = DiscoveringAiogoogle()
+    api = await DiscoveryCache(ttl=60, cache_dir=tmp_path).discover(
+        restarted_client, 'sheets', 'v4'
+    )
+    assert restarted_client.discoveries == 0 and (
+        api.discovery_document['name'] == 'sheets'
+    ), (
+        'После перезапуска документ обнаружения должен читаться '
+        'из кэша на диске без запросов к сети.'
+    )
+
+
+async def test_discovery_cache_falls_back_to_stale_document(tmp_path):
+    await DiscoveryCache(ttl=60, cache_dir=tmp_path).discover(
+        DiscoveringAiogoogle(), 'drive', 'v3'
+    )
+    api = await DiscoveryCache(ttl=0, cache_dir=tmp_path).discover(
+        DiscoveringAiogoogle(fail=True), 'drive', 'v3'
+    )
+    assert api.discovery_document['name'] == 'drive', (
+        'Если обновить устаревший документ обнаружения не удалось, '
+        'должен использоваться сохранённый.'
+    )
+
+
+async def test_access_token_is_refreshed_once_before_expiry():
+    manager = CachedTokenManager(None, creds={'token_uri': ''}, margin=300)
+    grants = []
+    lifetime = [timedelta(hours=1)]
+
+    async def grant():
+        grants.append(1)
+        await asyncio.sleep(0)
+        manager._access_token = f'token-{len(grants)}'
+        manager._expires_at = (datetime.utcnow() + lifetime[0]).isoformat()
+
+    manager._get_oauth2_authorization_grant = grant
+    await asyncio.gather(*(manager.refresh() for _ in range(10)))
+    assert len(grants) == 1, (
+        'Одновременные запросы должны получать токен доступа '
+        'одним обращением к Google.'
+    )
+    await manager.refresh()
+    assert len(grants) == 1, (
+        'Действующий токен доступа должен переиспользоваться.'
+    )
+    lifetime[0] = timedelta(seconds=60)
+    manager._expires_at = (datetime.utcnow() + lifetime[0]).isoformat()
+    await manager.refresh()
+    assert len(grants) == 2, (
+        'Токен доступа должен обновляться заранее, незадолго '
+        'до истечения срока действия.'
+    )
+
+
+async def test_get_service_reuses_one_client():
+    clients = []
+    for _ in range(2):
+        async for client in get_service():
+            clients.append(client)
+    await google_client.stop()
+    assert clients[0] is clients[1], (
+        '`get_service` должен отдавать один долгоживущий клиент Google API.'
+    )
+
+
+@pytest.fixture
+def many_closed_projects(mixer):
+    for number in range(250):
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'closed project {number}',
+            description='Closed project',
+            full_amount=100,
+            invested_amount=100,
+            fully_invested=True,
+            create_date=datetime(2010, 10, 10),
+            close_date=datetime(2010, 10, 11) + timedelta(hours=number),
+            duration=86400 + 3600 * number,
+        )
+
+
+def written_rows(requests):
+    return sum(
+        len(item['values'])
+        for name, kwargs in requests
+        if name == 'spreadsheets.values.batchUpdate'
+        for item in kwargs['json']['data']
+    )
+
+
+@pytest.mark.usefixtures('many_closed_projects')
+def test_large_report_is_written_in_chunks(
+        superuser_client, fake_google, monkeypatch
+):
+    monkeypatch.setattr(settings, 'google_report_chunk_rows', 100)
+    monkeypatch.setattr(google_api, 'WRITE_RETRY_DELAY', 0)
+    fake_google.failures[3] = 503
+    response = superuser_client.get(REPORT_URL)
+    assert response.status_code == 200, (
+        'Отчёт, в котором больше 100 строк, должен формироваться '
+        'без ошибок.'
+    )
+    names = [name for name, _ in fake_google.requests]
+    create_body = fake_google.requests[0][1]['json']
+    assert create_body['sheets'][0]['properties']['gridProperties'][
+        'rowCount'
+    ] == 253, (
+        'Размер листа должен подбираться под количество строк отчёта.'
+    )
+    assert names.count('spreadsheets.values.batchUpdate') == 4, (
+        'Строки отчёта должны отправляться частями, а сбойная часть - '
+        'повторяться.'
+    )
+    assert written_rows(fake_google.requests[3:]) == 253, (
+        'Все строки отчёта должны быть записаны ровно один раз.'
+    )
+
+
+@pytest.mark.usefixtures('many_closed_projects')
+def test_persistent_report_resumes_after_failed_chunk(
+        superuser_client, fake_google, monkeypatch, freezer
+):
+    monkeypatch.setattr(settings, 'persistent_report', True)
+    monkeypatch.setattr(settings, 'email', 'owner@example.com')
+    monkeypatch.setattr(settings, 'google_report_chunk_rows', 100)
+    fake_google.failures[5] = 400
+    with pytest.raises(HTTPError):
+        superuser_client.get(REPORT_URL)
+    assert written_rows(fake_google.requests[:4]) == 100, (
+        'До сбоя должна быть записана только первая часть отчёта.'
+    )
+    fake_google.requests.clear()
+    response = superuser_client.get(REPORT_URL)
+    assert response.status_code == 200, (
+        'Повторное формирование отчёта после сбоя должно завершаться '
+        'успешно.'
+    )
+    assert written_rows(fake_google.requests) == 153, (
+        'После сбоя отчёт должен дописываться с первой '
+        'неподтверждённой части.'
+    )
+
+
+@pytest.mark.usefixtures('many_closed_projects')
+def test_json_report_is_limited_and_filtered(superuser_client, fake_google):
+    response = superuser_client.get(
+        REPORT_URL + 'json',
+        params={
+            'limit': 3,
+            'closed_from': '2010-10-11T10:00:00',
+            'closed_to': '2010-10-12T00:00:00',
+            'name_prefix': 'closed project 1',
+        },
+    )
+    assert response.status_code == 200, (
+        f'GET-запрос к эндпоинту `{REPORT_URL}json` должен вернуть '
+        'ответ со статус-кодом 200.'
+    )
+    assert [project['name'] for project in response.json()] == [
+        'closed project 10', 'closed project 11', 'closed project 12'
+    ], (
+        'Отчёт должен содержать только N самых быстро закрытых проектов '
+        'из заданного окна дат закрытия и с заданным началом названия.'
+    )
+    assert fake_google.requests == [], (
+        'JSON-вариант отчёта не должен обращаться к Google API.'
+    )
+
+
+@pytest.mark.usefixtures('many_closed_projects')
+def test_report_writes_only_limited_rows(superuser_client, fake_google):
+    response = superuser_client.get(REPORT_URL, params={'limit': 5})
+    assert response.status_code == 200, (
+        f'GET-запрос к эндпоинту `{REPORT_URL}` с параметром `limit` '
+        'должен вернуть ответ со статус-кодом 200.'
+    )
+    assert len(response.json()) == 5, (
+        'Отчёт должен содержать не больше `limit` проектов.'
+    )
+    assert written_rows(fake_google.requests) == 8, (
+        'В таблицу должны записываться только проекты, попавшие в отчёт.'
+    )
+
+
+def test_json_report_rejects_too_large_limit(superuser_client):
+    response = superuser_client.get(
+        REPORT_URL + 'json', params={'limit': 100000}
+    )
+    assert response.status_code == 422, (
+        'Слишком большой `limit` отчёта должен отклоняться '
+        'со статус-кодом 422.'
+    )
+
+
+@pytest.fixture
+def fake_report_jobs(fake_google, monkeypatch):
+    async def service_factory():
+        return fake_google
+
+    monkeypatch.setattr(report_jobs, 'session_factory', TestingSessionLocal)
+    monkeypatch.setattr(report_jobs, 'service_factory', service_factory)
+    return report_jobs
+
+
+@pytest.mark.usefixtures('small_fully_charity_project', 'fake_report_jobs')
+def test_report_job_reports_progress_and_url(superuser_client):
+    response = superuser_client.post(REPORT_URL + 'jobs')
+    assert response.status_code == 202, (
+        f'POST-запрос к эндпоинту `{REPORT_URL}jobs` должен вернуть '
+        'ответ со статус-кодом 202.'
+    )
+    job_url = f'{REPORT_URL}jobs/{response.json()["id"]}'
+    for _ in range(100):
+        job = superuser_client.get(job_url).json()
+        if job['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.01)
+    assert job['status'] == 'done', (
+        'Фоновое формирование отчёта должно завершаться успешно.'
+    )
+    assert job['spreadsheet_url'].endswith('/report-sheet'), (
+        'Завершённое задание должно содержать ссылку на таблицу отчёта.'
+    )
+    assert job['written_rows'] == job['total_rows'] == 4, (
+        'Задание должно сообщать, сколько строк отчёта уже записано.'
+    )
+    response = superuser_client.get(f'{REPORT_URL}jobs/unknown')
+    assert response.status_code == 404, (
+        'Запрос несуществующего задания должен вернуть статус-код 404.'
+    )
+
+
+async def test_identical_report_jobs_are_deduplicated():
+    fake = FakeAiogoogle()
+
+    async def service_factory():
+        return fake
+
+    manager = ReportJobManager(TestingSessionLocal, service_factory)
+    first_job = manager.submit()
+    second_job = manager.submit()
+    assert first_job is second_job, (
+        'Одинаковые запросы отчёта, пришедшие во время его формирования, '
+        'должны объединяться в одно задание.'
+    )
+    await asyncio.gather(*manager._tasks)
+    assert manager.submit() is not first_job, (
+        'После завершения задания новый запрос должен запускать '
+        'новое задание.'
+    )
+    await manager.stop()
@@ -1,4 +1,21 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
 import pytest
+from conftest import TestingSessionLocal
+from fixtures.user import user
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.core.donation_cache import donation_cache
+from app.crud import charity_project_crud, donation_crud
+from app.models import CharityProject, Donation
+from app.schemas import DonationCreate
+from app.services.allocation_queue import (
+    AllocationWorker, DonationBatcher, InMemoryAllocationQueue
+)
+from app.services.investment import allocate, create_and_allocate, invest
 
 DONATION_URL = '/donation/'
 PROJECTS_URL = '/charity_project/'
@@ -60,3 +77,426 @@ def test_donation_to_little_invest_project(
     )
     assert not charity_project_nunchaku.fully_invested, common_asser_msg
     assert charity_project_nunchaku.invested_amount == 0, common_asser_msg
+
+
+PROJECT_AMOUNTS = [(100, 0), (250, 50), (80, 80), (300, 0), (40, 0)]
+DONATION_AMOUNTS = [(120, 20), (60, 0), (500, 0)]
+SEED_CREATE_DATE = datetime(2020, 1, 1, 12, 30, 15, 500000)
+
+
+async def seed_investment_objects(session, with_donations=True):
+    session.add_all([
+        CharityProject(
+            name=f'project {number}',
+            description='description',
+            full_amount=full_amount,
+            invested_amount=invested_amount,
+            fully_invested=full_amount == invested_amount,
+            create_date=SEED_CREATE_DATE,
+        )
+        for number, (full_amount, invested_amount)
+        in enumerate(PROJECT_AMOUNTS)
+    ])
+    session.add_all([
+        Donation(
+            user_id=1,
+            full_amount=full_amount,
+            invested_amount=invested_amount,
+        )
+        for full_amount, invested_amount in DONATION_AMOUNTS
+        if with_donations
+    ])
+    await session.commit()
+
+
+async def investment_snapshot(session):
+    snapshot = {}
+    for model in (CharityProject, Donation):
+        objs = await session.execute(select(model).order_by(model.id))
+        snapshot[model.__name__] = [
+            (
+                obj.id, obj.invested_amount, obj.fully_invested,
+                obj.close_date, getattr(obj, 'duration', None)
+            )
+            for obj in objs.scalars().all()
+        ]
+    return snapshot
+
+
+def closing_snapshot(snapshot):
+    return {
+        model_name: [
+            (obj_id, invested_amount, fully_invested, close_date is not None)
+            for obj_id, invested_amount, fully_invested, close_date, _ in objs
+        ]
+        for model_name, objs in snapshot.items()
+    }
+
+
+async def run_allocation(obj_to_invest, mode, monkeypatch):
+    async with TestingSessionLocal() as session:
+        await seed_investment_objects(session)
+        obj_to_invest.create_date = SEED_CREATE_DATE
+        session.add(obj_to_invest)
+        await session.commit()
+        await session.refresh(obj_to_invest)
+        if mode == 'loop':
+            crud = (
+                donation_crud if isinstance(obj_to_invest, CharityProject)
+                else charity_project_crud
+            )
+            investments = await crud.get_active_objs(session)
+            await invest(obj_to_invest, investments, session)
+        else:
+            monkeypatch.setattr(settings, 'allocation_mode', mode)
+            await allocate(obj_to_invest, session)
+        snapshot = await investment_snapshot(session)
+        for model in (CharityProject, Donation):
+            await session.execute(delete(model))
+        await session.commit()
+    return snapshot
+
+
+@pytest.mark.parametrize('make_obj_to_invest', [
+    lambda: Donation(user_id=2, full_amount=10),
+    lambda: Donation(user_id=2, full_amount=250),
+    lambda: Donation(user_id=2, full_amount=550),
+    lambda: Donation(user_id=2, full_amount=10000),
+    lambda: CharityProject(
+        name='new project', description='description', full_amount=50),
+    lambda: CharityProject(
+        name='new project', description='description', full_amount=660),
+    lambda: CharityProject(
+        name='new project', description='description', full_amount=1000),
+])
+async def test_allocation_modes_match_invest_loop(
+        freezer, monkeypatch, make_obj_to_invest
+):
+    freezer.move_to('2020-02-02')
+    expected = await run_allocation(make_obj_to_invest(), 'loop', monkeypatch)
+    for mode in ('ledger', 'sql'):
+        result = await run_allocation(
+            make_obj_to_invest(), mode, monkeypatch
+        )
+        assert result == expected, (
+            f'Распределение средств в режиме `{mode}` должно давать '
+            'тот же результат, что и функция `invest`.'
+        )
+
+
+PARALLEL_DONATIONS = 60
+PARALLEL_PROJECTS = 10
+PARALLEL_PROJECT_AMOUNT = 700
+
+
+def test_parallel_donations_are_not_double_allocated(user_client, mixer):
+    for number in range(PARALLEL_PROJECTS):
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'parallel project {number}',
+            description='description',
+            full_amount=PARALLEL_PROJECT_AMOUNT,
+            invested_amount=0,
+            fully_invested=False,
+            close_date=None,
+        )
+    amounts = [100 + number * 7 for number in range(PARALLEL_DONATIONS)]
+    with ThreadPoolExecutor(max_workers=PARALLEL_DONATIONS) as executor:
+        responses = list(executor.map(
+            lambda amount: user_client.post(
+                DONATION_URL, json={'full_amount': amount}
+            ),
+            amounts
+        ))
+    assert all(response.status_code == 200 for response in responses), (
+        'Параллельные POST-запросы к эндпоинту '
+        f'`{DONATION_URL}` должны завершаться со статус-кодом 200.'
+    )
+    session = mixer.params['session']
+    projects = session.query(CharityProject).all()
+    donations = session.query(Donation).all()
+    invested_in_projects = sum(obj.invested_amount for obj in projects)
+    invested_from_donations = sum(obj.invested_amount for obj in donations)
+    expected = min(sum(amounts), PARALLEL_PROJECTS * PARALLEL_PROJECT_AMOUNT)
+    assert invested_in_projects == invested_from_donations == expected, (
+        'При параллельных пожертвованиях сумма, распределённая по проектам, '
+        'должна совпадать с суммой, списанной с пожертвований.'
+    )
+    for obj in [*projects, *donations]:
+        assert obj.invested_amount <= obj.full_amount, (
+            'Объект не может быть инвестирован больше своей полной суммы.'
+        )
+        assert obj.fully_invested == (
+            obj.invested_amount == obj.full_amount
+        ), (
+            'Объект должен быть закрыт тогда и только тогда, когда '
+            'он полностью инвестирован.'
+        )
+
+
+async def test_allocation_worker_allocates_queued_objects():
+    async with TestingSessionLocal() as session:
+        await seed_investment_objects(session)
+        donation = Donation(user_id=2, full_amount=10000)
+        session.add(donation)
+        await session.commit()
+        await session.refresh(donation)
+    worker = AllocationWorker(InMemoryAllocationQueue(), TestingSessionLocal)
+    await worker.start()
+    await worker.enqueue('Donation', donation.id)
+    await worker.queue.join()
+    await worker.stop()
+    assert worker.status()['processed'] == 1, (
+        'Фоновый обработчик должен учитывать обработанные объекты.'
+    )
+    async with TestingSessionLocal() as session:
+        projects = await session.execute(
+            select(CharityProject).where(
+                CharityProject.fully_invested.is_(False)
+            )
+        )
+        assert not projects.scalars().all(), (
+            'После прохода фонового распределения средств '
+            'не должно оставаться открытых проектов.'
+        )
+        donations = await session.execute(select(Donation))
+        assert sum(
+            obj.invested_amount for obj in donations.scalars().all()
+        ) == sum(
+            full_amount - invested_amount
+            for full_amount, invested_amount in PROJECT_AMOUNTS
+        ) + sum(invested_amount for _, invested_amount in DONATION_AMOUNTS), (
+            'Фоновое распределение должно списать с пожертвований '
+            'ровно сумму, недостающую открытым проектам.'
+        )
+
+
+async def test_allocation_worker_starts_lazily_and_survives_errors():
+    def broken_session_factory():
+        raise RuntimeError('database is down')
+
+    worker = AllocationWorker(
+        InMemoryAllocationQueue(), broken_session_factory
+    )
+    await worker.enqueue('Donation', 1)
+    assert worker.is_running, (
+        'Фоновый обработчик должен запускаться при первой постановке '
+        'объекта в очередь.'
+    )
+    await worker.stop()
+    assert worker.status()['last_error'] == 'database is down', (
+        'Ошибка последнего прохода при остановке должна попадать в статус, '
+        'а не пробрасываться наружу.'
+    )
+
+
+async def test_donation_batcher_matches_sequential_allocation(monkeypatch):
+    amounts = [30, 170, 5, 400, 60]
+    async with TestingSessionLocal() as session:
+        await seed_investment_objects(session, with_donations=False)
+        for amount in amounts:
+            donation = Donation(user_id=2, full_amount=amount)
+            session.add(donation)
+            await session.commit()
+            await session.refresh(donation)
+            await allocate(donation, session)
+        expected = closing_snapshot(await investment_snapshot(session))
+        for model in (CharityProject, Donation):
+            await session.execute(delete(model))
+        await session.commit()
+
+    monkeypatch.setattr(settings, 'allocation_batch_window', 0.01)
+    async with TestingSessionLocal() as session:
+        await seed_investment_objects(session, with_donations=False)
+    batcher = DonationBatcher(TestingSessionLocal)
+    donations = await asyncio.gather(*[
+        batcher.submit(DonationCreate(full_amount=amount), user)
+        for amount in amounts
+    ])
+    assert [
+        (
+            donation.id,
+            donation.invested_amount,
+            donation.fully_invested,
+            donation.close_date is not None
+        )
+        for donation in donations
+    ] == expected['Donation'], (
+        'Каждое пожертвование из пакета должно быть распределено так же, '
+        'как при последовательной обработке по порядку id.'
+    )
+    async with TestingSessionLocal() as session:
+        result = closing_snapshot(await investment_snapshot(session))
+    assert result == expected, (
+        'Пакетное распределение пожертвований должно давать тот же '
+        'результат, что и последовательная обработка по порядку id.'
+    )
+
+
+@pytest.mark.parametrize('mode', ['ledger', 'sql'])
+async def test_create_and_allocate_commits_once(monkeypatch, mode):
+    monkeypatch.setattr(settings, 'allocation_mode', mode)
+    amounts = [30, 170, 400]
+    async with TestingSessionLocal() as session:
+        await seed_investment_objects(session, with_donations=False)
+        for amount in amounts:
+            donation = Donation(user_id=2, full_amount=amount)
+            session.add(donation)
+            await session.commit()
+            await session.refresh(donation)
+            await allocate(donation, session)
+        expected = closing_snapshot(await investment_snapshot(session))
+        for model in (CharityProject, Donation):
+            await session.execute(delete(model))
+        await session.commit()
+
+    async with TestingSessionLocal() as session:
+        await seed_investment_objects(session, with_donations=False)
+        calls = []
+        for name in ('commit', 'refresh'):
+            method = getattr(session, name)
+
+            async def counted(*args, method=method, name=name):
+                calls.append(name)
+                await method(*args)
+
+            monkeypatch.setattr(session, name, counted)
+        responses = []
+        for amount in amounts:
+            donation = await create_and_allocate(
+                donation_crud, DonationCreate(full_amount=amount),
+                session, user
+            )
+            responses.append((
+                donation.id,
+                donation.invested_amount,
+                donation.fully_invested,
+                donation.close_date is not None
+            ))
+    assert calls == ['commit'] * len(amounts), (
+        'Создание и распределение пожертвования должны завершаться '
+        'одним коммитом без повторного чтения объекта.'
+    )
+    assert responses == expected['Donation'], (
+        'Ответ должен содержать значения, сохранённые в базе данных.'
+    )
+    async with TestingSessionLocal() as session:
+        result = closing_snapshot(await investment_snapshot(session))
+    assert result == expected, (
+        'Создание с распределением в одной транзакции должно давать '
+        'тот же результат, что и раздельные коммиты.'
+    )
+
+
+@pytest.mark.parametrize('content_type, body', [
+    (
+        'application/json',
+        '[{"full_amount": 100, "user_id": 7},'
+        ' {"full_amount": -5, "user_id": 7},'
+        ' {"full_amount": 10, "user_id": 999},'
+        ' {"full_amount": 100, "user_id": 7, "comment": "Batch"}]'
+    ),
+    (
+        'text/csv',
+        'full_amount,user_id,comment\n'
+        '100,7,\n'
+        '-5,7,\n'
+        '10,999,\n'
+        '100,7,Batch\n'
+    ),
+], ids=['json', 'csv'])
+def test_import_donations_allocates_batch(
+        superuser_client, mixer, content_type, body
+):
+    mixer.blend('app.models.user.User', id=7)
+    project = mixer.blend(
+        'app.models.charity_project.CharityProject',
+        full_amount=150,
+        invested_amount=0,
+        fully_invested=False,
+    )
+    response = superuser_client.post(
+        DONATION_URL + 'import',
+        data=body,
+        headers={'Content-Type': content_type}
+    )
+    assert response.status_code == 200, (
+        'Импорт пачки пожертвований суперпользователем должен вернуть '
+        'ответ со статус-кодом 200.'
+    )
+    result = response.json()
+    assert result['imported'] == 2, (
+        'Импорт должен сохранить все корректные строки пачки.'
+    )
+    assert [error['row'] for error in result['errors']] == [2, 3], (
+        'Импорт должен сообщать номера некорректных строк и строк '
+        'с несуществующим пользователем, не прерывая загрузку пачки.'
+    )
+
+    async def load():
+        async with TestingSessionLocal() as session:
+            donations = await session.execute(
+                select(Donation).order_by(Donation.id)
+            )
+            return (
+                await session.get(CharityProject, project.id),
+                donations.scalars().all()
+            )
+
+    project, donations = asyncio.run(load())
+    assert project.fully_invested and project.invested_amount == 150, (
+        'Импортированные пожертвования должны распределяться '
+        'по открытым проектам.'
+    )
+    assert [
+        (donation.invested_amount, donation.fully_invested)
+        for donation in donations
+    ] == [(100, True), (50, False)], (
+        'Пожертвования пачки должны распределяться в порядке строк, '
+        'как если бы они создавались по одному.'
+    )
+
+
+async def test_completion_rate_report_uses_stored_duration(freezer):
+    freezer.move_to('2020-01-10')
+    async with TestingSessionLocal() as session:
+        session.add_all([
+            CharityProject(
+                name=f'project {number}',
+                description='description',
+                full_amount=100,
+                create_date=datetime.now() - timedelta(days=days),
+            )
+            for number, days in enumerate((3, 1, 2))
+        ])
+        donation = Donation(user_id=2, full_amount=300)
+        session.add(donation)
+        await session.commit()
+        await session.refresh(donation)
+        await allocate(donation, session)
+        projects = await charity_project_crud.get_projects_by_completion_rate(
+            session, limit=2
+        )
+    assert [(project.name, project.duration) for project in projects] == [
+        ('project 1', 86400), ('project 2', 172800)
+    ], (
+        'Отчёт должен возвращать самые быстро закрытые проекты '
+        'по сохранённой длительности сбора с учётом ограничения.'
+    )
+
+
+async def test_project_allocation_expires_donation_summaries():
+    etag = donation_cache.etag(1)
+    async with TestingSessionLocal() as session:
+        await seed_investment_objects(session)
+        project = CharityProject(
+            name='new project', description='description', full_amount=50
+        )
+        session.add(project)
+        await session.commit()
+        await session.refresh(project)
+        await allocate(project, session)
+    assert donation_cache.etag(1) != etag, (
+        'Распределение пожертвований в новый проект должно сбрасывать '
+        'кэш сводок пожертвований пользователей.'
+    )
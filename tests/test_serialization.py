@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+from conftest import app, current_user
+from fixtures.user import superuser
+
+from app.api import serialization
+from app.core.config import settings
+from app.core.response_cache import project_list_cache
+
+PAGE_LIMIT = 3
+LIST_URLS = [
+    '/charity_project/',
+    '/donation/',
+    '/donation/my',
+]
+
+
+@pytest.fixture
+def listed_objects(mixer):
+    for number in range(PAGE_LIMIT + 1):
+        closed = number % 2 == 0
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'Проект «{number}» "с кавычками"',
+            description='Описание\nв две строки',
+            full_amount=100 * (number + 1),
+            invested_amount=100 * (number + 1) if closed else number,
+            fully_invested=closed,
+            create_date=datetime(2010, 10, 10, 1, 2, 3, 450000),
+            close_date=datetime(2010, 10, 11) if closed else None,
+        )
+        mixer.blend(
+            'app.models.donation.Donation',
+            user_id=superuser.id,
+            full_amount=50 * (number + 1),
+            comment=None if closed else f'Комментарий {number}',
+            invested_amount=50 * (number + 1) if closed else 0,
+            fully_invested=closed,
+            create_date=datetime(2011, 1, 1, 0, 0, 0, 7),
+            close_date=datetime(2011, 1, 2, 3, 4, 5) if closed else None,
+        )
+
+
+async def list_pages(client, url):
+    await project_list_cache.invalidate()
+    pages = []
+    params = {'limit': PAGE_LIMIT}
+    while True:
+        response = client.get(url, params=params)
+        assert response.status_code == 200, (
+            f'GET-запрос к эндпоинту `{url}` должен вернуть '
+            'статус-код 200.'
+        )
+        next_cursor = response.headers.get('X-Next-Cursor')
+        pages.append(
+            (response.content, next_cursor, response.headers.get('ETag'))
+        )
+        if next_cursor is None:
+            return pages
+        params['cursor'] = next_cursor
+
+
+@pytest.mark.parametrize('url', LIST_URLS)
+@pytest.mark.parametrize('use_orjson', [True, False])
+@pytest.mark.usefixtures('listed_objects')
+async def test_fast_serialization_matches_pydantic(
+        superuser_client, monkeypatch, url, use_orjson
+):
+    app.dependency_overrides[current_user] = lambda: superuser
+    if not use_orjson:
+        monkeypatch.setattr(serialization, 'orjson', None)
+    elif serialization.orjson is None:
+        pytest.skip('orjson is not installed')
+    expected = await list_pages(superuser_client, url)
+    monkeypatch.setattr(settings, 'fast_serialization', True)
+    result = await list_pages(superuser_client, url)
+    assert len(expected) > 1, 'Список должен занимать несколько страниц.'
+    assert result == expected, (
+        f'Быстрая сериализация ответа эндпоинта `{url}` должна давать '
+        'те же байты, курсоры страниц и ETag, что и сериализация '
+        'через Pydantic.'
+    )
@@ -0,0 +1,98 @@
+import pytest
+from conftest import TestingSessionLocal, app, current_user
+from fixtures.user import superuser, user
+
+from app.core.config import settings
+from app.crud import charity_project_crud, donation_crud
+from app.crud.fund_stats import fund_stats_crud
+from app.models import CharityProject
+from app.schemas import CharityProjectCreate, DonationCreate
+from app.services.fund_stats import check_fund_stats
+from app.services.investment import allocate, invest
+
+STATS_URL = '/stats/'
+PROJECTS_URL = '/charity_project/'
+DONATION_URL = '/donation/'
+
+
+def test_stats_follow_project_and_donation_changes(superuser_client):
+    app.dependency_overrides[current_user] = lambda: superuser
+    for name, full_amount in (('first', 100), ('second', 300), ('third', 50)):
+        superuser_client.post(PROJECTS_URL, json={
+            'name': name, 'description': 'description',
+            'full_amount': full_amount,
+        })
+    superuser_client.post(DONATION_URL, json={'full_amount': 150})
+    superuser_client.patch(PROJECTS_URL + '2', json={'full_amount': 50})
+    superuser_client.delete(PROJECTS_URL + '3')
+    superuser_client.post(DONATION_URL, json={'full_amount': 70})
+    response = superuser_client.get(STATS_URL)
+    assert response.status_code == 200, (
+        f'GET-запрос к эндпоинту `{STATS_URL}` должен вернуть '
+        'ответ со статус-кодом 200.'
+    )
+    assert response.json() == {
+        'total_raised': 220,
+        'total_invested': 150,
+        'open_projects': 0,
+        'unallocated_amount': 70,
+    }, (
+        'Сводные показатели фонда должны обновляться при создании, '
+        'изменении и удалении проектов и при пожертвованиях.'
+    )
+
+
+async def create_and_allocate(crud, data, session, mode, user=None):
+    obj = await crud.create(data, session, user)
+    if mode == 'loop':
+        opposite_crud = (
+            donation_crud if isinstance(obj, CharityProject)
+            else charity_project_crud
+        )
+        await invest(
+            obj, await opposite_crud.get_active_objs(session), session
+        )
+    else:
+        await allocate(obj, session)
+
+
+@pytest.mark.parametrize('mode', ['loop', 'ledger', 'sql'])
+async def test_stats_match_recount_after_allocation(monkeypatch, mode):
+    monkeypatch.setattr(settings, 'allocation_mode', mode)
+    async with TestingSessionLocal() as session:
+        for number, full_amount in enumerate((100, 250, 40)):
+            await create_and_allocate(
+                charity_project_crud,
+                CharityProjectCreate(
+                    name=f'project {number}', description='description',
+                    full_amount=full_amount
+                ),
+                session, mode
+            )
+        for full_amount in (120, 60, 500, 30):
+            await create_and_allocate(
+                donation_crud, DonationCreate(full_amount=full_amount),
+                session, mode, user
+            )
+        assert await check_fund_stats(session) == {}, (
+            f'В режиме распределения `{mode}` сводные показатели фонда '
+            'должны совпадать с пересчётом по таблицам.'
+        )
+        assert await fund_stats_crud.get(session) == {
+            'total_raised': 710, 'total_invested': 390, 'open_projects': 0,
+        }, 'Сводные показатели фонда посчитаны неверно.'
+
+
+@pytest.mark.usefixtures('charity_project', 'donation')
+async def test_check_fund_stats_fixes_drift():
+    async with TestingSessionLocal() as session:
+        mismatches = await check_fund_stats(session, fix=True)
+        assert set(mismatches) == {
+            'total_raised', 'total_invested', 'open_projects'
+        }, (
+            'Проверка должна находить показатели, расходящиеся '
+            'с пересчётом по таблицам.'
+        )
+        assert await check_fund_stats(session) == {}, (
+            'После исправления показатели должны совпадать с пересчётом.'
+        )